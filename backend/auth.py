@@ -1,13 +1,20 @@
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_read_db, replica_engines, use_primary
 from models import User
 from schemas import TokenData
+from cache import LRUCache
+from cache_backend import cache_backend, invalidation_bus
+from hashing import hashing_executor
+from metrics import AUTH_FAILURES, REQUESTS_SHED
+from rate_limit import chat_rate_limiter, retry_after_header
 from config import settings
 
 # Password hashing
@@ -16,6 +23,27 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Authenticated principals keyed by token, so repeat requests skip the users lookup
+principal_cache = LRUCache(settings.principal_cache_size)
+PRINCIPAL_FIELDS = ("id", "username", "email", "is_active", "is_admin", "created_at")
+
+def principal_key(username: str) -> str:
+    """Shared cache key for a user's principal."""
+    return f"principal:{username}"
+
+def drop_principals(user_id: Optional[str]):
+    """Drop locally cached principals for a user, or for everyone when ``user_id`` is None."""
+    if user_id is None:
+        principal_cache.clear()
+    else:
+        principal_cache.delete_where(lambda principal: principal["id"] == int(user_id))
+
+invalidation_bus.register("principals", drop_principals)
+
+async def invalidate_user_principals(user_id: int, username: str):
+    """Drop cached principals for a user on every worker after their account changes."""
+    await invalidation_bus.invalidate("principals", str(user_id), shared_keys=[principal_key(username)])
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash."""
     return pwd_context.verify(plain_password, hashed_password)
@@ -24,12 +52,12 @@ def get_password_hash(password: str) -> str:
     """Hash a password."""
     return pwd_context.hash(password)
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
     """Authenticate a user by username and password."""
-    user = db.query(User).filter(User.username == username).first()
+    user = await db.scalar(select(User).filter(User.username == username))
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    if not await hashing_executor.run(verify_password, password, user.password_hash):
         return None
     return user
 
@@ -45,7 +73,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_read_db)) -> User:
     """Get the current authenticated user from JWT token."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -53,29 +81,73 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         headers={"WWW-Authenticate": "Bearer"},
     )
     
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return User(**principal)
+    
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         username: str = payload.get("sub")
         if username is None:
+            AUTH_FAILURES.labels("invalid_token").inc()
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
+        AUTH_FAILURES.labels("invalid_token").inc()
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == token_data.username).first()
-    if user is None:
-        raise credentials_exception
+    # Another worker may already have looked the user up
+    principal = await cache_backend.get_json(principal_key(token_data.username))
+    if principal is not None:
+        principal["created_at"] = datetime.fromisoformat(principal["created_at"])
+        user = User(**principal)
+    else:
+        query = select(User).filter(User.username == token_data.username)
+        user = await db.scalar(query)
+        if user is None and replica_engines:
+            # The account may not have reached the replica yet
+            use_primary(db)
+            user = await db.scalar(query)
+        if user is None:
+            AUTH_FAILURES.labels("unknown_user").inc()
+            raise credentials_exception
+        principal = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        await cache_backend.set_json(
+            principal_key(user.username),
+            {**principal, "created_at": user.created_at.isoformat()},
+            settings.principal_cache_ttl_seconds
+        )
+    
+    # Cache the principal until the token expires or the TTL elapses
+    expires_at = time.time() + settings.principal_cache_ttl_seconds
+    if payload.get("exp"):
+        expires_at = min(expires_at, payload["exp"])
+    principal_cache.set(token, {field: getattr(user, field) for field in PRINCIPAL_FIELDS}, expires_at)
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Get the current active user."""
     if not current_user.is_active:
+        AUTH_FAILURES.labels("inactive_user").inc()
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+async def get_rate_limited_user(current_user: User = Depends(get_current_active_user)) -> User:
+    """Get the current active user, rejecting requests beyond their chat rate limit."""
+    retry_after = await chat_rate_limiter.hit(str(current_user.id))
+    if retry_after is not None:
+        REQUESTS_SHED.labels("rate_limited").inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many messages, slow down",
+            headers={"Retry-After": retry_after_header(retry_after)}
+        )
+    return current_user
+
 async def get_current_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
     """Get the current admin user."""
     if not current_user.is_admin:
+        AUTH_FAILURES.labels("not_admin").inc()
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
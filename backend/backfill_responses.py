@@ -0,0 +1,44 @@
+"""Convert inline copies of catalog responses in ``messages`` to catalog references.
+
+Run once after upgrading to the response catalog schema::
+
+    python backfill_responses.py --batch-size 1000
+
+Each batch commits on its own, so the tool can be interrupted and re-run.
+"""
+import argparse
+import asyncio
+import logging
+from chatbot import chatbot
+from crud import backfill_response_refs
+from database import SessionLocal, dispose_engines
+from response_catalog import response_catalog
+
+logger = logging.getLogger(__name__)
+
+async def backfill(batch_size: int, pause_seconds: float):
+    """Walk the messages table in id order, converting one batch per transaction."""
+    async with SessionLocal() as db:
+        await response_catalog.sync(db, chatbot.responses)
+    
+    last_id, converted = 0, 0
+    while True:
+        async with SessionLocal() as db:
+            count, last_id = await backfill_response_refs(db, last_id, batch_size)
+        if last_id is None:
+            break
+        converted += count
+        logger.info(f"Converted {converted} messages (scanned up to id {last_id})")
+        # Leave room for live traffic between batches
+        await asyncio.sleep(pause_seconds)
+    
+    logger.info(f"Backfill complete: {converted} messages now reference the response catalog")
+    await dispose_engines()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause-seconds", type=float, default=0.1)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(backfill(args.batch_size, args.pause_seconds))
@@ -0,0 +1,132 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+from config import settings
+
+class StaleWhileRevalidateCache:
+    """Single-value TTL cache that serves the previous snapshot while one caller refreshes it."""
+    
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._value: Any = None
+        self._has_value = False
+        self._expires_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+    
+    def invalidate(self):
+        """Mark the cached value stale; it is still served while a refresh runs."""
+        self._generation += 1
+        self._expires_at = 0.0
+    
+    async def get(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value, recomputing it with ``compute`` when stale."""
+        if self.ttl_seconds <= 0:
+            return await compute()
+        
+        if self._has_value and (time.monotonic() < self._expires_at or self._lock.locked()):
+            return self._value
+        
+        async with self._lock:
+            # Another caller may have refreshed the value while we waited
+            if self._has_value and time.monotonic() < self._expires_at:
+                return self._value
+            
+            generation = self._generation
+            value = await compute()
+            self._value = value
+            self._has_value = True
+            # A write that landed during the computation leaves the value stale
+            if generation == self._generation:
+                self._expires_at = time.monotonic() + self.ttl_seconds
+            return value
+
+class LRUCache:
+    """Bounded least-recently-used cache whose entries expire at a wall-clock time."""
+    
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value for ``key``, or None when missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: Hashable, value: Any, expires_at: float):
+        """Store ``value`` until the epoch timestamp ``expires_at``."""
+        if self.max_size <= 0:
+            return
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def expires_at(self, key: Hashable) -> Optional[float]:
+        """Return when ``key`` expires, or None when missing or expired."""
+        if self.get(key) is None:
+            return None
+        return self._entries[key][1]
+    
+    def delete(self, key: Hashable):
+        """Remove ``key`` if present."""
+        self._entries.pop(key, None)
+    
+    def delete_where(self, predicate: Callable[[Any], bool]):
+        """Remove every entry whose value matches ``predicate``."""
+        for key in [key for key, (value, _) in self._entries.items() if predicate(value)]:
+            del self._entries[key]
+    
+    def clear(self):
+        """Remove all entries."""
+        self._entries.clear()
+
+class ConversationCache:
+    """Rolling window of the last turns of recently active chat sessions."""
+    
+    def __init__(self, max_sessions: int, max_turns: int, ttl_seconds: float):
+        self.max_turns = max_turns
+        self.ttl_seconds = ttl_seconds
+        self._sessions = LRUCache(max_sessions)
+    
+    def get(self, session_id: int) -> Optional[List[Dict[str, str]]]:
+        """Return a session's cached turns, oldest first, or None on a miss."""
+        turns = self._sessions.get(session_id)
+        return list(turns) if turns is not None else None
+    
+    def set(self, session_id: int, turns: List[Dict[str, str]]):
+        """Cache a session's most recent turns."""
+        self._sessions.set(session_id, deque(turns, maxlen=self.max_turns), time.time() + self.ttl_seconds)
+    
+    def append(self, session_id: int, turn: Dict[str, str]):
+        """Add a turn to a cached session; uncached sessions are loaded on their next read."""
+        turns = self._sessions.get(session_id)
+        if turns is not None:
+            turns.append(turn)
+            self._sessions.set(session_id, turns, time.time() + self.ttl_seconds)
+    
+    def evict(self, session_id: int):
+        """Drop a session's cached turns."""
+        self._sessions.delete(session_id)
+    
+    def clear(self):
+        """Drop every cached session."""
+        self._sessions.clear()
+
+# Admin dashboard statistics cache
+stats_cache = StaleWhileRevalidateCache(settings.stats_cache_ttl_seconds)
+
+# Recent turns per chat session, used as conversation context
+conversation_cache = ConversationCache(
+    settings.conversation_cache_sessions,
+    settings.conversation_history_turns,
+    settings.conversation_cache_ttl_seconds
+)
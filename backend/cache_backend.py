@@ -0,0 +1,395 @@
+import asyncio
+import json
+import logging
+import math
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from urllib.parse import unquote, urlparse
+from cache import LRUCache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class CacheError(Exception):
+    """A shared cache operation failed; callers treat it as a miss."""
+
+class CacheBackend(ABC):
+    """Key-value store with expiry, counters and pub-sub, shared by every worker that uses it."""
+    
+    name = "base"
+    
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]:
+        """Return the value for ``key``, or None when missing or expired."""
+    
+    @abstractmethod
+    async def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        """Store ``value``, expiring after ``ttl_seconds`` when given."""
+    
+    @abstractmethod
+    async def delete(self, *keys: str):
+        """Remove ``keys`` if present."""
+    
+    @abstractmethod
+    async def incr(self, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        """Add to a counter, creating it with ``ttl_seconds`` expiry if missing, and return the new value."""
+    
+    @abstractmethod
+    async def ttl(self, key: str) -> Optional[float]:
+        """Return the seconds until ``key`` expires, or None when missing or without expiry."""
+    
+    @abstractmethod
+    async def publish(self, channel: str, message: str):
+        """Send ``message`` to every subscriber of ``channel``."""
+    
+    @abstractmethod
+    async def subscribe(self, channel: str, handler: Callable[[Optional[str]], None]):
+        """Call ``handler`` with each message on ``channel``; None means messages may have been missed."""
+    
+    async def close(self):
+        """Release connections and stop listening."""
+    
+    async def get_json(self, key: str) -> Optional[Any]:
+        """Return a JSON value, treating cache failures as a miss."""
+        try:
+            value = await self.get(key)
+        except CacheError as e:
+            logger.warning(f"Cache read of {key} failed: {e}")
+            return None
+        return json.loads(value) if value is not None else None
+    
+    async def set_json(self, key: str, value: Any, ttl_seconds: float):
+        """Store a JSON value, ignoring cache failures."""
+        if ttl_seconds <= 0:
+            return
+        try:
+            await self.set(key, json.dumps(value), ttl_seconds)
+        except CacheError as e:
+            logger.warning(f"Cache write of {key} failed: {e}")
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process backend for a single worker; pub-sub only reaches this process."""
+    
+    name = "memory"
+    
+    def __init__(self, max_size: int):
+        self._entries = LRUCache(max_size)
+        self._handlers: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+    
+    def _expires_at(self, ttl_seconds: Optional[float]) -> float:
+        """Convert a TTL into the LRU cache's epoch expiry."""
+        return time.time() + ttl_seconds if ttl_seconds else math.inf
+    
+    async def get(self, key: str) -> Optional[str]:
+        return self._entries.get(key)
+    
+    async def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        self._entries.set(key, value, self._expires_at(ttl_seconds))
+    
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.delete(key)
+    
+    async def incr(self, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        current = self._entries.get(key)
+        expires_at = self._entries.expires_at(key) if current is not None else self._expires_at(ttl_seconds)
+        value = int(current or 0) + amount
+        self._entries.set(key, str(value), expires_at)
+        return value
+    
+    async def ttl(self, key: str) -> Optional[float]:
+        expires_at = self._entries.expires_at(key)
+        if expires_at is None or expires_at == math.inf:
+            return None
+        return max(expires_at - time.time(), 0.0)
+    
+    async def publish(self, channel: str, message: str):
+        for handler in self._handlers.get(channel, []):
+            handler(message)
+    
+    async def subscribe(self, channel: str, handler: Callable[[Optional[str]], None]):
+        self._handlers.setdefault(channel, []).append(handler)
+    
+    def clear(self):
+        """Remove every key."""
+        self._entries.clear()
+
+# Redis serialization protocol (RESP2)
+class ReplyError(Exception):
+    """An error reply from the server."""
+
+def encode_command(*args: Any) -> bytes:
+    """Encode a command as a RESP array of bulk strings."""
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    """Read one RESP reply; error replies are returned as ReplyError instances."""
+    line = await reader.readuntil(b"\r\n")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode()
+    if kind == b"-":
+        return ReplyError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        return (await reader.readexactly(length + 2))[:-2]
+    if kind == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise CacheError(f"Unexpected reply from server: {line!r}")
+
+class RedisCacheBackend(CacheBackend):
+    """Backend speaking the Redis protocol, so every worker and pod shares one store."""
+    
+    name = "redis"
+    # After a connection failure, fail fast for this long instead of waiting on each call
+    RETRY_INTERVAL_SECONDS = 1.0
+    
+    def __init__(self, url: str, pool_size: int = 10, timeout_seconds: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout_seconds = timeout_seconds
+        self._slots = asyncio.Semaphore(pool_size)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._retry_at = 0.0
+        self._handlers: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._subscriber: Optional[asyncio.StreamWriter] = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Open a connection, authenticating and selecting the database from the URL."""
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.username, self.password) if self.username else ("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        try:
+            for reply in await self._roundtrip(reader, writer, setup):
+                if isinstance(reply, ReplyError):
+                    raise CacheError(f"Redis connection setup failed: {reply}")
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+    
+    async def _roundtrip(self, reader, writer, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Write every command, then read their replies in order."""
+        if not commands:
+            return []
+        writer.write(b"".join(encode_command(*command) for command in commands))
+        await writer.drain()
+        return [await read_reply(reader) for _ in commands]
+    
+    async def execute(self, *commands: Sequence[Any]) -> List[Any]:
+        """Run pipelined commands on a pooled connection and return their replies."""
+        if time.monotonic() < self._retry_at:
+            raise CacheError("Redis unavailable")
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._connect(), self.timeout_seconds)
+                replies = await asyncio.wait_for(self._roundtrip(*conn, commands), self.timeout_seconds)
+            except (OSError, EOFError, asyncio.TimeoutError, CacheError) as e:
+                if conn is not None:
+                    conn[1].close()
+                self._retry_at = time.monotonic() + self.RETRY_INTERVAL_SECONDS
+                raise CacheError(f"Redis command failed: {e!r}") from e
+            except BaseException:
+                # A half-read reply leaves the connection unusable
+                if conn is not None:
+                    conn[1].close()
+                raise
+            self._idle.append(conn)
+        for reply in replies:
+            if isinstance(reply, ReplyError):
+                raise CacheError(f"Redis error: {reply}")
+        return replies
+    
+    async def get(self, key: str) -> Optional[str]:
+        (value,) = await self.execute(("GET", key))
+        return value.decode() if value is not None else None
+    
+    async def set(self, key: str, value: str, ttl_seconds: Optional[float] = None):
+        if ttl_seconds:
+            await self.execute(("SET", key, value, "PX", max(int(ttl_seconds * 1000), 1)))
+        else:
+            await self.execute(("SET", key, value))
+    
+    async def delete(self, *keys: str):
+        if keys:
+            await self.execute(("DEL", *keys))
+    
+    async def incr(self, key: str, amount: int = 1, ttl_seconds: Optional[float] = None) -> int:
+        if not ttl_seconds:
+            (value,) = await self.execute(("INCRBY", key, amount))
+            return value
+        # Creating the key with its expiry first keeps the counter from living forever
+        _, value = await self.execute(
+            ("SET", key, 0, "PX", max(int(ttl_seconds * 1000), 1), "NX"),
+            ("INCRBY", key, amount)
+        )
+        return value
+    
+    async def ttl(self, key: str) -> Optional[float]:
+        (remaining,) = await self.execute(("PTTL", key))
+        return remaining / 1000 if remaining >= 0 else None
+    
+    async def publish(self, channel: str, message: str):
+        await self.execute(("PUBLISH", channel, message))
+    
+    async def subscribe(self, channel: str, handler: Callable[[Optional[str]], None]):
+        is_new = channel not in self._handlers
+        self._handlers.setdefault(channel, []).append(handler)
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+        elif is_new and self._subscriber is not None:
+            self._subscriber.write(encode_command("SUBSCRIBE", channel))
+    
+    def _dispatch(self, channel: str, message: Optional[str]):
+        for handler in self._handlers.get(channel, []):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.error(f"Cache message handler for {channel} failed: {e!r}")
+    
+    async def _listen(self):
+        """Hold a subscriber connection open, reconnecting after failures."""
+        connected_before = False
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.wait_for(self._connect(), self.timeout_seconds)
+                writer.write(encode_command("SUBSCRIBE", *self._handlers))
+                await writer.drain()
+                self._subscriber = writer
+                if connected_before:
+                    # Messages published while disconnected were lost
+                    for channel in self._handlers:
+                        self._dispatch(channel, None)
+                connected_before = True
+                while True:
+                    reply = await read_reply(reader)
+                    if isinstance(reply, list) and len(reply) == 3 and reply[0] == b"message":
+                        self._dispatch(reply[1].decode(), reply[2].decode())
+            except asyncio.CancelledError:
+                if writer is not None:
+                    writer.close()
+                raise
+            except Exception as e:
+                logger.warning(f"Redis subscriber disconnected: {e!r}")
+                self._subscriber = None
+                if writer is not None:
+                    writer.close()
+                await asyncio.sleep(self.RETRY_INTERVAL_SECONDS)
+    
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+            self._subscriber = None
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
+
+class InvalidationBus:
+    """Applies cache invalidations locally and broadcasts them to the other workers."""
+    
+    channel = "cache-invalidation"
+    
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        # Lets a worker skip its own broadcasts, which it has already applied
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, Callable[[Optional[str]], None]] = {}
+        self._pending: Set[asyncio.Task] = set()
+    
+    def register(self, kind: str, handler: Callable[[Optional[str]], None]):
+        """Handle invalidations of ``kind``; the handler gets the key, or None to drop everything."""
+        self._handlers[kind] = handler
+    
+    def handle(self, message: Optional[str]):
+        """Apply an invalidation received from another worker."""
+        if message is None:
+            for handler in self._handlers.values():
+                handler(None)
+            return
+        event = json.loads(message)
+        handler = self._handlers.get(event["kind"])
+        if handler is not None and event["origin"] != self.origin:
+            handler(event["key"])
+    
+    async def _broadcast(self, kind: str, key: Optional[str], shared_keys: Sequence[str] = (),
+                         stale_keys: Sequence[str] = ()):
+        """Drop or mark stale the shared values, then tell the other workers."""
+        try:
+            if shared_keys:
+                await self.backend.delete(*shared_keys)
+            for stale_key in stale_keys:
+                await self.backend.incr(stale_key)
+            await self.backend.publish(
+                self.channel, json.dumps({"origin": self.origin, "kind": kind, "key": key})
+            )
+        except CacheError as e:
+            # Other workers fall back to their cache TTLs
+            logger.warning(f"Broadcasting {kind} invalidation failed: {e}")
+    
+    async def invalidate(self, kind: str, key: Optional[str] = None,
+                         shared_keys: Sequence[str] = (), local: bool = True):
+        """Drop ``shared_keys`` from the backend and ``key`` from every worker's ``kind`` cache."""
+        if local:
+            self._handlers[kind](key)
+        await self._broadcast(kind, key, shared_keys)
+    
+    def invalidate_soon(self, kind: str, key: Optional[str] = None,
+                        stale_keys: Sequence[str] = (), local: bool = True):
+        """Like invalidate, but broadcast in the background so the caller never waits on the backend.
+        
+        Shared values are kept for stale-while-revalidate: each counter in
+        ``stale_keys`` is bumped to mark the value it versions as stale.
+        """
+        if local:
+            self._handlers[kind](key)
+        task = asyncio.create_task(self._broadcast(kind, key, stale_keys=stale_keys))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+    
+    async def drain(self):
+        """Wait for background broadcasts to finish."""
+        if self._pending:
+            await asyncio.gather(*self._pending)
+    
+    async def start(self):
+        """Start receiving other workers' invalidations."""
+        await self.backend.subscribe(self.channel, self.handle)
+
+def create_cache_backend() -> CacheBackend:
+    """Create the cache backend selected in settings."""
+    if settings.cache_backend == "redis":
+        return RedisCacheBackend(settings.redis_url, settings.redis_pool_size, settings.redis_timeout_seconds)
+    return MemoryCacheBackend(settings.cache_backend_size)
+
+# Global shared cache backend and invalidation bus
+cache_backend = create_cache_backend()
+invalidation_bus = InvalidationBus(cache_backend)
@@ -1,11 +1,89 @@
 import asyncio
+import json
+import logging
 import random
-from typing import List, Dict
+import re
+import time
+from collections import deque
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+from llm import CompletionBackend, CompletionError, create_backend
+from singleflight import SingleFlight
+from metrics import CHATBOT_LATENCY, coalescing_collector
+
+logger = logging.getLogger(__name__)
+
+# User context keys that influence the shared (pre-personalization) response
+INTENT_CONTEXT_KEYS = ()
+
+def normalize_message(message: str) -> str:
+    """Reduce a message to lowercase words so trivially different duplicates coalesce."""
+    return " ".join(re.findall(r"\w+", message.lower()))
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over word tokens, matching whole-word keywords in one pass."""
+
+    _token_re = re.compile(r"\w+")
+
+    def __init__(self, keywords: Dict[str, List[str]]):
+        # Each node: outgoing transitions, failure link, and (category, keyword) outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[Tuple[str, str], ...]] = [()]
+
+        for category, words in keywords.items():
+            for word in words:
+                self._add(word, category)
+        self._build()
+
+    def _add(self, keyword: str, category: str):
+        """Insert a keyword, as a sequence of word tokens, into the trie."""
+        node = 0
+        for token in self._token_re.findall(keyword.lower()):
+            nxt = self._goto[node].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] += ((category, keyword),)
+
+    def _build(self):
+        """Compute failure links breadth-first and merge outputs along them."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(token, 0)
+                self._out[child] += self._out[self._fail[child]]
+
+    def match(self, text: str) -> Dict[str, int]:
+        """Return the number of distinct keywords per category found in the text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = {}
+        node = 0
+        for token in self._token_re.findall(text.lower()):
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for category, keyword in out[node]:
+                found.setdefault(category, set()).add(keyword)
+        return {category: len(words) for category, words in found.items()}
 
 class ChatbotService:
-    """Simple chatbot service with predefined responses."""
+    """Chatbot service backed by a completion backend, with predefined keyword responses as fallback."""
     
-    def __init__(self):
+    def __init__(self, backend: Optional[CompletionBackend] = None):
+        self.backend = backend
+        self.flight = SingleFlight()
+        # Simulated thinking time, in seconds, for keyword responses
+        self.delay_range = (0.5, 2.0)
         self.responses = {
             "greeting": [
                 "Hello! How can I help you today?",
@@ -63,34 +141,152 @@ class ChatbotService:
             "business": ["business", "company", "startup", "entrepreneur", "marketing", "management", "strategy"],
             "technology": ["technology", "tech", "computer", "software", "ai", "artificial intelligence", "programming", "code"]
         }
-    
-    async def generate_response(self, message: str, user_context: Dict = None) -> str:
-        """Generate a response based on the user's message."""
-        message_lower = message.lower()
-        
-        # Add some realistic delay
-        await asyncio.sleep(random.uniform(0.5, 2.0))
         
-        # Find the best matching category
+        # Compile the keyword table once instead of rescanning it per message
+        self.matcher = KeywordMatcher(self.keywords)
+    
+    def classify(self, message: str) -> str:
+        """Return the intent category that best matches the message."""
         best_category = "default"
         max_matches = 0
         
-        for category, keywords in self.keywords.items():
-            matches = sum(1 for keyword in keywords if keyword in message_lower)
+        counts = self.matcher.match(message)
+        for category in self.keywords:
+            matches = counts.get(category, 0)
             if matches > max_matches:
                 max_matches = matches
                 best_category = category
         
+        return best_category
+    
+    def pick_response(self, message: str) -> Tuple[str, str]:
+        """Pick the intent category and a response for the message."""
+        # Find the best matching category
+        best_category = self.classify(message)
+        
         # Get a random response from the best category
         responses = self.responses[best_category]
-        response = random.choice(responses)
-        
+        return best_category, random.choice(responses)
+    
+    def personalize(self, category: Optional[str], response: str, user_context: Dict = None) -> str:
+        """Apply per-user touches to a shared response."""
         # Add some personalization if user context is available
         if user_context and user_context.get("username"):
-            if best_category == "greeting":
+            if category == "greeting":
                 response = f"Hello {user_context['username']}! " + response.split("Hello! ", 1)[-1]
         
         return response
+    
+    def intent_context(self, user_context: Dict = None, history: List[Dict[str, str]] = None) -> Dict:
+        """Return the part of the user context and conversation that can change the shared response."""
+        context = {key: user_context[key] for key in INTENT_CONTEXT_KEYS if key in user_context} if user_context else {}
+        # Keyword responses ignore earlier turns, so only a completion backend sees them
+        if history and self.backend is not None:
+            context["history"] = history
+        return context
+    
+    async def complete_with_backend(self, message: str, context: Dict = None) -> Optional[str]:
+        """Ask the completion backend for a response, or return None to fall back to keywords."""
+        if self.backend is None:
+            return None
+        try:
+            return await self.backend.complete(message, context)
+        except CompletionError as e:
+            logger.warning(f"{self.backend.name} backend failed, using keyword responses: {e}")
+            return None
+    
+    async def _shared_response(self, message: str, context: Dict) -> Tuple[Optional[str], str]:
+        """Produce the user-independent (category, response) for a message."""
+        response = await self.complete_with_backend(message, context)
+        if response is not None:
+            return None, response
+        
+        # Add some realistic delay
+        await asyncio.sleep(random.uniform(*self.delay_range))
+        
+        return self.pick_response(message)
+    
+    async def generate_response(self, message: str, user_context: Dict = None, history: List[Dict[str, str]] = None) -> str:
+        """Generate a response based on the user's message and the session's recent turns.
+        
+        Concurrent identical messages with the same context share one
+        computation; personalization is applied to each caller's copy afterwards.
+        """
+        start = time.perf_counter()
+        context = self.intent_context(user_context, history)
+        key = (normalize_message(message), json.dumps(context, sort_keys=True, default=str))
+        category, response = await self.flight.do(key, lambda: self._shared_response(message, context))
+        CHATBOT_LATENCY.labels(category or self.backend.name).observe(time.perf_counter() - start)
+        return self.personalize(category, response, user_context)
+    
+    async def stream_response(self, message: str, user_context: Dict = None, history: List[Dict[str, str]] = None) -> AsyncIterator[str]:
+        """Generate a response incrementally, yielding it word by word."""
+        start = time.perf_counter()
+        response = await self.complete_with_backend(message, self.intent_context(user_context, history))
+        category, delay = None, 0.0
+        if response is None:
+            category, response = self.pick_response(message)
+            response = self.personalize(category, response, user_context)
+            # Spread the same realistic delay across the chunks instead of paying it upfront
+            delay = random.uniform(*self.delay_range)
+        
+        chunks = re.findall(r"\S+\s*", response)
+        delay /= max(len(chunks), 1)
+        for chunk in chunks:
+            await asyncio.sleep(delay)
+            yield chunk
+        # Only completed streams are recorded, so disconnects do not skew the latency
+        CHATBOT_LATENCY.labels(category or self.backend.name).observe(time.perf_counter() - start)
+    
+    def warm_up(self):
+        """Run every keyword through the matcher so the first real message takes the fast path."""
+        for words in self.keywords.values():
+            for word in words:
+                self.classify(word)
+    
+    def status(self) -> Dict:
+        """Report which backend answers messages and whether it is healthy."""
+        if self.backend is None:
+            return {"backend": "keyword", "status": "ok"}
+        return {"backend": self.backend.name, **self.backend.status()}
+    
+    async def close(self):
+        """Release the completion backend's resources."""
+        if self.backend is not None:
+            await self.backend.close()
 
 # Global chatbot instance
-chatbot = ChatbotService()
+chatbot = ChatbotService(create_backend())
+coalescing_collector.register("chatbot", chatbot.flight)
+
+def _benchmark(iterations: int = 2000):
+    """Compare the compiled matcher against the naive substring scan."""
+    # Pad each intent to a realistic catalog size of a few hundred keywords
+    service = ChatbotService()
+    for category, keywords in service.keywords.items():
+        keywords.extend(f"{category} term {i}" for i in range(300))
+    service.matcher = KeywordMatcher(service.keywords)
+
+    def naive(message: str) -> str:
+        message_lower = message.lower()
+        best_category, max_matches = "default", 0
+        for category, keywords in service.keywords.items():
+            matches = sum(1 for keyword in keywords if keyword in message_lower)
+            if matches > max_matches:
+                max_matches, best_category = matches, category
+        return best_category
+
+    messages = {
+        "short": "hi, can you help me with my budget?",
+        "long": " ".join(["I was thinking about starting a company and writing some software"] * 40),
+    }
+    for label, message in messages.items():
+        for name, fn in (("naive", naive), ("matcher", service.classify)):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                fn(message)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>5} {name:>7}: {elapsed / iterations * 1e6:8.2f} us/message")
+
+if __name__ == "__main__":
+    _benchmark()
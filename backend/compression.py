@@ -0,0 +1,125 @@
+import base64
+import logging
+import random
+import time
+import zlib
+from typing import Optional
+from sqlalchemy import Text
+from sqlalchemy.types import TypeDecorator
+
+logger = logging.getLogger(__name__)
+
+# Marks a compressed value; a control character real chat text does not start with
+COMPRESSED_PREFIX = "\x02zlib:"
+
+def compress_text(value: str, level: int = 6) -> str:
+    """Compress text into a prefixed, base64-encoded string that fits a TEXT column."""
+    packed = zlib.compress(value.encode("utf-8"), level)
+    return COMPRESSED_PREFIX + base64.b64encode(packed).decode("ascii")
+
+def decompress_text(value: str) -> str:
+    """Reverse compress_text; values without the prefix are returned unchanged."""
+    if not value.startswith(COMPRESSED_PREFIX):
+        return value
+    packed = base64.b64decode(value[len(COMPRESSED_PREFIX):])
+    return zlib.decompress(packed).decode("utf-8")
+
+class CompressedText(TypeDecorator):
+    """TEXT column that stores values of ``threshold`` characters or more zlib-compressed.
+
+    Compressed values carry COMPRESSED_PREFIX, so rows written before compression
+    was enabled, and short values, are read back as-is. A threshold of 0 turns
+    compression off for new writes.
+    """
+    
+    impl = Text
+    cache_ok = True
+    
+    def __init__(self, threshold: int = 1024, level: int = 6, **kw):
+        super().__init__(**kw)
+        self.threshold = threshold
+        self.level = level
+    
+    def process_bind_param(self, value: Optional[str], dialect) -> Optional[str]:
+        if value is None:
+            return None
+        # Text that happens to start with the prefix is compressed so it reads back intact
+        if value.startswith(COMPRESSED_PREFIX) or (self.threshold and len(value) >= self.threshold):
+            compressed = compress_text(value, self.level)
+            if len(compressed) < len(value) or value.startswith(COMPRESSED_PREFIX):
+                return compressed
+        return value
+    
+    def process_result_value(self, value: Optional[str], dialect) -> Optional[str]:
+        if value is None:
+            return None
+        return decompress_text(value)
+
+def warn_if_compressing(threshold: int):
+    """Log at startup that compressed bodies will be missing from full-text search."""
+    if threshold > 0:
+        logger.warning(
+            f"MESSAGE_COMPRESSION_THRESHOLD is {threshold}: messages of {threshold} characters "
+            "or more are stored compressed and will not be found by full-text search"
+        )
+
+def _synthetic_conversation(rng: random.Random, turns: int):
+    """Yield (message, response) pairs resembling chat with a generative backend."""
+    vocabulary = (
+        "the a to of and in for is on that with your you can this it be as are "
+        "budget invest savings portfolio risk interest rate inflation market stock bond "
+        "exercise nutrition sleep diet health doctor routine protein heart "
+        "startup customer marketing revenue strategy product team growth pricing "
+        "python code model data api deploy server database query latency cache"
+    ).split()
+    for _ in range(turns):
+        message = " ".join(rng.choices(vocabulary, k=rng.randint(4, 30)))
+        sentences = [
+            " ".join(rng.choices(vocabulary, k=rng.randint(8, 24))).capitalize() + "."
+            for _ in range(rng.randint(2, 60))
+        ]
+        yield message, " ".join(sentences)
+
+def _benchmark(turns: int = 5000, threshold: int = 1024):
+    """Compare stored size and read latency of plain and compressed message bodies in SQLite."""
+    from sqlalchemy import Column, Integer, MetaData, Table, create_engine, func, select, insert
+
+    metadata = MetaData()
+    tables = {
+        "plain": Table("plain", metadata, Column("id", Integer, primary_key=True),
+                       Column("message_text", Text), Column("response_text", Text)),
+        "compressed": Table("compressed", metadata, Column("id", Integer, primary_key=True),
+                            Column("message_text", CompressedText(threshold)),
+                            Column("response_text", CompressedText(threshold))),
+    }
+    engine = create_engine("sqlite://")
+    metadata.create_all(engine)
+    rows = [
+        {"message_text": message, "response_text": response}
+        for message, response in _synthetic_conversation(random.Random(42), turns)
+    ]
+    raw_bytes = sum(len(row["message_text"]) + len(row["response_text"]) for row in rows)
+    print(f"{turns} turns, {raw_bytes / 1e6:.2f} MB of text, threshold {threshold} characters")
+
+    with engine.begin() as conn:
+        for name, table in tables.items():
+            start = time.perf_counter()
+            conn.execute(insert(table), rows)
+            write_seconds = time.perf_counter() - start
+
+            # length() is computed by the database over the stored form
+            stored = conn.scalar(select(func.sum(
+                func.length(table.c.message_text) + func.length(table.c.response_text)
+            )))
+            start = time.perf_counter()
+            for _ in range(5):
+                conn.execute(select(table)).all()
+            read_seconds = (time.perf_counter() - start) / 5
+            print(
+                f"{name:>10}: stored {stored / 1e6:6.2f} MB ({stored / raw_bytes:5.1%}), "
+                f"write {write_seconds * 1e3:7.1f} ms, read all {read_seconds * 1e3:7.1f} ms "
+                f"({read_seconds / turns * 1e6:5.1f} us/row)"
+            )
+
+if __name__ == "__main__":
+    _benchmark()
@@ -9,15 +9,77 @@ class Settings(BaseSettings):
     # Database
     database_url: str = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost:3306/chatbot_db")
     
+    # Read replicas (comma-separated URLs; selection is "round_robin" or "least_busy")
+    database_replica_urls: str = os.getenv("DATABASE_REPLICA_URLS", "")
+    replica_selection: str = os.getenv("REPLICA_SELECTION", "round_robin")
+    
+    # Startup
+    auto_migrate: bool = os.getenv("AUTO_MIGRATE", "False").lower() == "true"
+    db_pool_warmup_connections: int = int(os.getenv("DB_POOL_WARMUP_CONNECTIONS", "5"))
+    
     # JWT
     secret_key: str = os.getenv("SECRET_KEY", "your-super-secret-jwt-key-change-this-in-production")
     algorithm: str = os.getenv("ALGORITHM", "HS256")
     access_token_expire_minutes: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
     
+    # Password hashing
+    password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+    password_hash_queue_size: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", "32"))
+    
     # Environment
     environment: str = os.getenv("ENVIRONMENT", "development")
     debug: bool = os.getenv("DEBUG", "True").lower() == "true"
     
+    # Query instrumentation
+    slow_query_threshold_ms: float = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+    query_budget_per_request: int = int(os.getenv("QUERY_BUDGET_PER_REQUEST", "20"))
+    
+    # Caching
+    stats_cache_ttl_seconds: float = float(os.getenv("STATS_CACHE_TTL_SECONDS", "30"))
+    principal_cache_size: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+    principal_cache_ttl_seconds: float = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+    conversation_history_turns: int = int(os.getenv("CONVERSATION_HISTORY_TURNS", "10"))
+    conversation_cache_sessions: int = int(os.getenv("CONVERSATION_CACHE_SESSIONS", "10000"))
+    conversation_cache_ttl_seconds: float = float(os.getenv("CONVERSATION_CACHE_TTL_SECONDS", "1800"))
+    
+    # Shared cache backend ("memory" for a single worker, "redis" to share across workers and pods)
+    cache_backend: str = os.getenv("CACHE_BACKEND", "memory")
+    cache_backend_size: int = int(os.getenv("CACHE_BACKEND_SIZE", "100000"))
+    redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    redis_pool_size: int = int(os.getenv("REDIS_POOL_SIZE", "10"))
+    redis_timeout_seconds: float = float(os.getenv("REDIS_TIMEOUT_SECONDS", "1"))
+    
+    # Rate limiting: per-user chat messages per minute (0 disables), allowing bursts of this many
+    chat_rate_limit_per_minute: float = float(os.getenv("CHAT_RATE_LIMIT_PER_MINUTE", "30"))
+    chat_rate_limit_burst: int = int(os.getenv("CHAT_RATE_LIMIT_BURST", "10"))
+    # Admission control: bot generations in flight per worker before requests get 503 (0 disables)
+    max_inflight_generations: int = int(os.getenv("MAX_INFLIGHT_GENERATIONS", "32"))
+    admission_retry_after_seconds: int = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1"))
+    
+    # Chatbot backend ("keyword" or "http")
+    chatbot_backend: str = os.getenv("CHATBOT_BACKEND", "keyword")
+    llm_url: str = os.getenv("LLM_URL", "http://localhost:8001/complete")
+    llm_timeout_seconds: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "10"))
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "2"))
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "32"))
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "64"))
+    
+    # Message persistence
+    message_write_behind: bool = os.getenv("MESSAGE_WRITE_BEHIND", "False").lower() == "true"
+    message_batch_size: int = int(os.getenv("MESSAGE_BATCH_SIZE", "100"))
+    message_flush_interval_ms: int = int(os.getenv("MESSAGE_FLUSH_INTERVAL_MS", "50"))
+    message_id_block_size: int = int(os.getenv("MESSAGE_ID_BLOCK_SIZE", "1000"))
+    # Past this many buffered messages, new ones are written directly
+    message_buffer_max_size: int = int(os.getenv("MESSAGE_BUFFER_MAX_SIZE", "10000"))
+    # Message bodies at least this many characters long are stored compressed (0 disables).
+    # Full-text search indexes the stored bytes, so compressed bodies cannot be searched.
+    message_compression_threshold: int = int(os.getenv("MESSAGE_COMPRESSION_THRESHOLD", "0"))
+    
+    # Health probes
+    health_probe_interval_seconds: float = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "5"))
+    health_probe_timeout_seconds: float = float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "2"))
+    pool_saturation_threshold: float = float(os.getenv("POOL_SATURATION_THRESHOLD", "0.9"))
+    
     # CORS
     cors_origins: List[str] = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
     
@@ -1,111 +1,370 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
-from models import User, Message, Session as ChatSession
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, select, func, insert, update, or_, and_
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import aliased
+from models import User, Message, Session as ChatSession, DailyMessageCount, IdAllocation
 from schemas import UserCreate, MessageCreate, SessionCreate
 from auth import get_password_hash
-from typing import List, Optional
+from cache import conversation_cache, stats_cache
+from cache_backend import invalidation_bus
+from hashing import hashing_executor
+from response_catalog import response_catalog
+from collections import Counter
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from datetime import date, datetime
+import base64
+import json
+
+# Cache invalidation, broadcast so every worker drops its copy
+STATS_CACHE_KEY = "stats:dashboard:snapshot"
+# Bumped on every write; the shared snapshot is stale when its version lags behind
+STATS_VERSION_KEY = "stats:dashboard:version"
+
+def drop_conversation(session_id: Optional[str]):
+    """Drop a session's cached turns, or every session's when ``session_id`` is None."""
+    if session_id is None:
+        conversation_cache.clear()
+    else:
+        conversation_cache.evict(int(session_id))
+
+invalidation_bus.register("stats", lambda key: stats_cache.invalidate())
+invalidation_bus.register("conversation", drop_conversation)
+
+def invalidate_stats():
+    """Mark dashboard statistics stale on every worker, keeping the snapshot for stale reads.
+    
+    Only account changes call this. Message writes rely on the stats TTL, so
+    steady chat traffic refreshes the dashboard at most once per interval.
+    """
+    invalidation_bus.invalidate_soon("stats", stale_keys=[STATS_VERSION_KEY])
+
+def invalidate_conversation(session_id: int, local: bool = True):
+    """Drop a session's cached turns on every worker, or only the others when ``local`` is False."""
+    invalidation_bus.invalidate_soon("conversation", str(session_id), local=local)
+
+# Keyset pagination helpers
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode a (created_at, id) position as an opaque cursor."""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def next_cursor(rows: list, limit: int, time_field: str = "created_at") -> Optional[str]:
+    """Return the cursor following the last row of a full page, or None on the last page."""
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, time_field), last.id)
+
+def after_cursor(time_column, id_column, cursor: str, descending: bool = True):
+    """Build the filter selecting rows strictly after a cursor in (time, id) order."""
+    created_at, row_id = decode_cursor(cursor)
+    if descending:
+        return or_(time_column < created_at, and_(time_column == created_at, id_column < row_id))
+    return or_(time_column > created_at, and_(time_column == created_at, id_column > row_id))
 
 # User CRUD operations
-def get_user(db: Session, user_id: int) -> Optional[User]:
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
     """Get user by ID."""
-    return db.query(User).filter(User.id == user_id).first()
+    return await db.scalar(select(User).filter(User.id == user_id))
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """Get user by username."""
-    return db.query(User).filter(User.username == username).first()
+    return await db.scalar(select(User).filter(User.username == username))
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get user by email."""
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(select(User).filter(User.email == email))
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    """Get all users with pagination."""
-    return db.query(User).offset(skip).limit(limit).all()
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[User]:
+    """Get all users with offset or cursor pagination."""
+    query = select(User).order_by(User.created_at, User.id)
+    if cursor:
+        query = query.filter(after_cursor(User.created_at, User.id, cursor, descending=False))
+    else:
+        query = query.offset(skip)
+    result = await db.scalars(query.limit(limit))
+    return result.all()
 
-def create_user(db: Session, user: UserCreate) -> User:
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
     """Create a new user."""
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hashing_executor.run(get_password_hash, user.password)
     db_user = User(
         username=user.username,
         email=user.email,
         password_hash=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    invalidate_stats()
+    await db.refresh(db_user)
     return db_user
 
 # Session CRUD operations
-def create_chat_session(db: Session, user_id: int, session: SessionCreate) -> ChatSession:
+async def create_chat_session(db: AsyncSession, user_id: int, session: SessionCreate) -> ChatSession:
     """Create a new chat session."""
     db_session = ChatSession(
         user_id=user_id,
         title=session.title or "New Chat"
     )
     db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
+    await db.commit()
+    await db.refresh(db_session)
+    # A new session has no history, so its first turn needs no lookup
+    conversation_cache.set(db_session.id, [])
     return db_session
 
-def get_user_sessions(db: Session, user_id: int, skip: int = 0, limit: int = 50) -> List[ChatSession]:
+async def get_user_sessions(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 50) -> List[ChatSession]:
     """Get all sessions for a user."""
-    return db.query(ChatSession).filter(
+    result = await db.scalars(select(ChatSession).filter(
         ChatSession.user_id == user_id
-    ).order_by(desc(ChatSession.started_at)).offset(skip).limit(limit).all()
+    ).order_by(desc(ChatSession.started_at)).offset(skip).limit(limit))
+    return result.all()
 
-def get_session(db: Session, session_id: int, user_id: int) -> Optional[ChatSession]:
+async def get_session(db: AsyncSession, session_id: int, user_id: int) -> Optional[ChatSession]:
     """Get a specific session for a user."""
-    return db.query(ChatSession).filter(
+    return await db.scalar(select(ChatSession).filter(
         ChatSession.id == session_id,
         ChatSession.user_id == user_id
-    ).first()
+    ))
 
-def end_session(db: Session, session_id: int, user_id: int) -> Optional[ChatSession]:
+async def end_session(db: AsyncSession, session_id: int, user_id: int) -> Optional[ChatSession]:
     """End a chat session."""
-    session = get_session(db, session_id, user_id)
+    session = await get_session(db, session_id, user_id)
     if session:
         session.is_active = False
-        session.ended_at = db.execute("SELECT NOW()").scalar()
-        db.commit()
-        db.refresh(session)
+        session.ended_at = func.now()
+        await db.commit()
+        await db.refresh(session)
+        invalidate_conversation(session_id)
     return session
 
+# Message rollup operations
+def message_timestamp() -> datetime:
+    """Creation time for a new message, in UTC at the stored one-second precision.
+    
+    Set by the application rather than the database's NOW(), whose time zone
+    depends on the session, so a message is counted in the rollup under the
+    same day that DATE(created_at) later gives for it.
+    """
+    return datetime.utcnow().replace(microsecond=0)
+
+UPSERT_DIALECTS = {"mysql": mysql, "postgresql": postgresql, "sqlite": sqlite}
+
+async def increment_daily_message_count(db: AsyncSession, user_id: int, day: date, amount: int = 1):
+    """Add to a user's message count for a day in the rollup table."""
+    dialect = UPSERT_DIALECTS[db.bind.dialect.name]
+    stmt = dialect.insert(DailyMessageCount).values(user_id=user_id, day=day, message_count=amount)
+    if dialect is mysql:
+        stmt = stmt.on_duplicate_key_update(
+            message_count=DailyMessageCount.message_count + stmt.inserted.message_count
+        )
+    else:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyMessageCount.user_id, DailyMessageCount.day],
+            set_={"message_count": DailyMessageCount.message_count + stmt.excluded.message_count}
+        )
+    await db.execute(stmt)
+
 # Message CRUD operations
-def create_message(db: Session, user_id: int, message: MessageCreate, response_text: str = None) -> Message:
-    """Create a new message."""
+async def create_message(db: AsyncSession, user_id: int, message: MessageCreate, response_text: str = None,
+                         message_id: Optional[int] = None) -> Message:
+    """Create a new message and count it in the daily rollup, with autoincrement unless ``message_id`` is given."""
+    response_ref_id, stored_response_text = response_catalog.split(response_text)
     db_message = Message(
+        id=message_id,
         user_id=user_id,
         message_text=message.message_text,
-        response_text=response_text,
-        session_id=message.session_id
+        stored_response_text=stored_response_text,
+        response_ref_id=response_ref_id,
+        session_id=message.session_id,
+        created_at=message_timestamp()
     )
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await increment_daily_message_count(db, user_id, db_message.created_at.date())
+    await db.commit()
+    await db.refresh(db_message)
     return db_message
 
-def get_user_messages(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Message]:
-    """Get all messages for a user."""
-    return db.query(Message).filter(
+async def create_messages_bulk(db: AsyncSession, rows: List[dict]):
+    """Insert pre-built message rows with one multi-row INSERT and a single commit."""
+    await db.execute(insert(Message), rows)
+    per_day = Counter((row["user_id"], row["created_at"].date()) for row in rows)
+    for (user_id, day), count in per_day.items():
+        await increment_daily_message_count(db, user_id, day, count)
+    await db.commit()
+
+async def reserve_id_block(db: AsyncSession, name: str, size: int) -> Tuple[int, int]:
+    """Reserve a block of ``size`` ids for a table, returning the half-open range."""
+    allocation = await db.scalar(
+        select(IdAllocation).filter(IdAllocation.name == name).with_for_update()
+    )
+    # Never hand out ids below rows inserted through autoincrement
+    max_id = await db.scalar(select(func.max(Message.id))) or 0
+    if allocation is None:
+        allocation = IdAllocation(name=name, next_id=max_id + 1)
+        db.add(allocation)
+    start = max(allocation.next_id, max_id + 1)
+    allocation.next_id = start + size
+    await db.commit()
+    return start, start + size
+
+async def get_user_messages(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Message]:
+    """Get all messages for a user with offset or cursor pagination."""
+    query = select(Message).filter(
         Message.user_id == user_id
-    ).order_by(desc(Message.created_at)).offset(skip).limit(limit).all()
+    ).order_by(desc(Message.created_at), desc(Message.id))
+    if cursor:
+        query = query.filter(after_cursor(Message.created_at, Message.id, cursor))
+    else:
+        query = query.offset(skip)
+    result = await db.scalars(query.limit(limit))
+    return result.all()
 
-def get_session_messages(db: Session, session_id: int, user_id: int) -> List[Message]:
+async def get_session_messages(db: AsyncSession, session_id: int, user_id: int) -> List[Message]:
     """Get all messages for a specific session."""
-    return db.query(Message).filter(
+    result = await db.scalars(select(Message).filter(
         Message.session_id == session_id,
         Message.user_id == user_id
-    ).order_by(Message.created_at).all()
+    ).order_by(Message.created_at))
+    return result.all()
+
+def conversation_turn(message: Message) -> Dict[str, str]:
+    """Represent a stored message as a turn of conversation context."""
+    return {"user": message.message_text, "bot": message.response_text}
+
+async def get_session_history(db: AsyncSession, session_id: int, user_id: int) -> List[Dict[str, str]]:
+    """Get a session's recent turns, reading only the latest window from the database on a cache miss."""
+    turns = conversation_cache.get(session_id)
+    if turns is None:
+        result = await db.scalars(select(Message).filter(
+            Message.session_id == session_id,
+            Message.user_id == user_id
+        ).order_by(desc(Message.created_at), desc(Message.id)).limit(conversation_cache.max_turns))
+        turns = [conversation_turn(message) for message in reversed(result.all())]
+        conversation_cache.set(session_id, turns)
+    return turns
+
+async def get_messages_for_sessions(db: AsyncSession, session_ids: List[int], user_id: int) -> Dict[int, List[Message]]:
+    """Get the messages of several sessions in one query, grouped by session ID."""
+    messages = {session_id: [] for session_id in session_ids}
+    if not session_ids:
+        return messages
+    result = await db.scalars(select(Message).filter(
+        Message.session_id.in_(session_ids),
+        Message.user_id == user_id
+    ).order_by(Message.created_at, Message.id))
+    for message in result:
+        messages[message.session_id].append(message)
+    return messages
+
+async def get_session_summaries(db: AsyncSession, session_ids: List[int], user_id: int) -> Dict[int, dict]:
+    """Get message counts and the last message of several sessions in one query."""
+    summaries = {session_id: {"message_count": 0, "last_message": None} for session_id in session_ids}
+    if not session_ids:
+        return summaries
+    # Ids come from per-worker blocks, so the last message is the newest by (created_at, id), not the highest id
+    ranked = select(
+        Message,
+        func.count().over(partition_by=Message.session_id).label("message_count"),
+        func.row_number().over(
+            partition_by=Message.session_id,
+            order_by=(desc(Message.created_at), desc(Message.id))
+        ).label("position")
+    ).filter(
+        Message.session_id.in_(session_ids),
+        Message.user_id == user_id
+    ).subquery()
+    last_message = aliased(Message, ranked)
+    rows = await db.execute(
+        select(last_message, ranked.c.message_count).filter(ranked.c.position == 1)
+    )
+    for message, count in rows:
+        summaries[message.session_id] = {"message_count": count, "last_message": message}
+    return summaries
+
+async def get_all_messages(db: AsyncSession, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Message]:
+    """Get all messages (admin only) with offset or cursor pagination."""
+    query = select(Message).order_by(desc(Message.created_at), desc(Message.id))
+    if cursor:
+        query = query.filter(after_cursor(Message.created_at, Message.id, cursor))
+    else:
+        query = query.offset(skip)
+    result = await db.scalars(query.limit(limit))
+    return result.all()
+
+async def delete_message(db: AsyncSession, message: Message):
+    """Delete a message and remove it from the daily rollup."""
+    await increment_daily_message_count(db, message.user_id, message.created_at.date(), -1)
+    await db.delete(message)
+    await db.commit()
+    invalidate_stats()
+    if message.session_id is not None:
+        invalidate_conversation(message.session_id)
+
+# Columns included in message exports
+EXPORT_COLUMNS = ("id", "user_id", "session_id", "message_text", "response_text", "created_at")
+
+async def stream_messages_export(
+    db: AsyncSession,
+    user_id: Optional[int] = None,
+    session_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    batch_size: int = 1000
+) -> AsyncIterator[list]:
+    """Yield filtered message rows in batches from a server-side cursor."""
+    query = select(*(getattr(Message, column) for column in EXPORT_COLUMNS)).order_by(Message.id)
+    if user_id is not None:
+        query = query.filter(Message.user_id == user_id)
+    if session_id is not None:
+        query = query.filter(Message.session_id == session_id)
+    if start is not None:
+        query = query.filter(Message.created_at >= start)
+    if end is not None:
+        query = query.filter(Message.created_at < end)
+    
+    result = await db.stream(query.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield rows
 
-def get_all_messages(db: Session, skip: int = 0, limit: int = 100) -> List[Message]:
-    """Get all messages (admin only)."""
-    return db.query(Message).order_by(desc(Message.created_at)).offset(skip).limit(limit).all()
+async def backfill_response_refs(db: AsyncSession, after_id: int, batch_size: int = 1000) -> Tuple[int, Optional[int]]:
+    """Replace inline copies of catalog responses with references for one batch of messages.
+    
+    Returns the number of rows converted and the last id scanned, or None once
+    no messages are left after ``after_id``.
+    """
+    rows = (await db.execute(select(Message.id, Message.stored_response_text).filter(
+        Message.id > after_id,
+        Message.response_ref_id.is_(None),
+        Message.stored_response_text.isnot(None)
+    ).order_by(Message.id).limit(batch_size))).all()
+    if not rows:
+        return 0, None
+    
+    updates = []
+    for message_id, response_text in rows:
+        response_ref_id, _ = response_catalog.split(response_text)
+        if response_ref_id is not None:
+            updates.append({"id": message_id, "response_ref_id": response_ref_id, "stored_response_text": None})
+    if updates:
+        await db.execute(update(Message), updates)
+        await db.commit()
+    return len(updates), rows[-1].id
 
-def update_message_response(db: Session, message_id: int, response_text: str) -> Optional[Message]:
+async def update_message_response(db: AsyncSession, message_id: int, response_text: str) -> Optional[Message]:
     """Update message with bot response."""
-    message = db.query(Message).filter(Message.id == message_id).first()
+    message = await db.scalar(select(Message).filter(Message.id == message_id))
     if message:
-        message.response_text = response_text
-        db.commit()
-        db.refresh(message)
+        message.response_ref_id, message.stored_response_text = response_catalog.split(response_text)
+        await db.commit()
+        await db.refresh(message)
     return message
@@ -1,26 +1,152 @@
-from sqlalchemy import create_engine
+import asyncio
+import itertools
+import time
+from sqlalchemy import Select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings
+from metrics import DB_POOL_WAIT, pool_collector
+from query_stats import instrument_engine
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.debug
-)
+# Map synchronous drivers to their asyncio counterparts
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str):
+    """Return the database URL using an asyncio-compatible driver."""
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.drivername)
+    return url.set(drivername=driver) if driver else url
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long checkouts wait for a connection."""
+    
+    pool_name = "primary"
+    
+    def __init__(self, creator, pool_size: int = 5, max_overflow: int = 10, **kw):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kw)
+        # QueuePool keeps the overflow limit private; the health probe needs it for capacity
+        self.max_overflow = max_overflow
+    
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self.pool_name).observe(time.perf_counter() - start)
+
+def engine_options(url, pool_name: str = "primary") -> dict:
+    """Return engine keyword arguments suited to the database backend."""
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    # A subclass per engine keeps the label when the pool is recreated
+    poolclass = type(f"{TimedQueuePool.__name__}[{pool_name}]", (TimedQueuePool,), {"pool_name": pool_name})
+    return {"pool_pre_ping": True, "pool_recycle": 300, "poolclass": poolclass}
+
+def create_instrumented_engine(url: str, pool_name: str):
+    """Create an async engine whose pool and queries are reported under ``pool_name``."""
+    url = async_database_url(url)
+    created = create_async_engine(url, echo=settings.debug, **engine_options(url, pool_name))
+    pool_collector.register(pool_name, created.sync_engine.pool)
+    instrument_engine(created.sync_engine)
+    return created
+
+# Create SQLAlchemy async engines for the primary and any read replicas
+engine = create_instrumented_engine(settings.database_url, "primary")
+replica_engines = [
+    create_instrumented_engine(url.strip(), f"replica{index}")
+    for index, url in enumerate(settings.database_replica_urls.split(","))
+    if url.strip()
+]
+replica_cycle = itertools.cycle(replica_engines)
+
+def pick_replica():
+    """Choose the replica engine for the next read."""
+    if settings.replica_selection == "least_busy":
+        return min(replica_engines, key=lambda replica: getattr(replica.sync_engine.pool, "checkedout", lambda: 0)())
+    return next(replica_cycle)
+
+def is_read_only(clause) -> bool:
+    """Return True for plain SELECT statements that may run against a replica."""
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+class RoutingSession(Session):
+    """Session that sends reads to a replica until it writes or is pinned to the primary."""
+    
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if not replica_engines or self.info.get("use_primary"):
+            return engine.sync_engine
+        if self._flushing or not is_read_only(clause):
+            # Stay on the primary from now on so the session reads its own writes
+            self.info["use_primary"] = True
+            return engine.sync_engine
+        if "replica" not in self.info:
+            # One replica per session keeps its reads consistent with each other
+            self.info["replica"] = pick_replica()
+        return self.info["replica"].sync_engine
+
+def use_primary(db: AsyncSession):
+    """Route every later statement of a read session to the primary."""
+    db.info["use_primary"] = True
 
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+# Sessions for read-only endpoints, served by replicas when configured
+ReadSessionLocal = async_sessionmaker(
+    bind=engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+async def warm_pool(created, connections: int):
+    """Open pooled connections up front so early requests do not pay to connect."""
+    pool = created.sync_engine.pool
+    if hasattr(pool, "size"):
+        connections = min(connections, pool.size())
+    
+    async def ping():
+        async with created.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    
+    # Hold the connections concurrently so each ping opens a separate one
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+async def warm_pools():
+    """Warm the primary and replica pools."""
+    await asyncio.gather(*(
+        warm_pool(created, settings.db_pool_warmup_connections)
+        for created in [engine, *replica_engines]
+    ))
+
+async def dispose_engines():
+    """Close the connection pools of the primary and every replica."""
+    for created in [engine, *replica_engines]:
+        await created.dispose()
 
 # Create Base class
 Base = declarative_base()
 
 # Dependency to get DB session
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
+        yield db
+
+# Dependency to get a DB session for read-only endpoints
+async def get_read_db():
+    async with ReadSessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from fastapi import HTTPException, status
+from config import settings
+from metrics import HASH_LATENCY, HASH_QUEUE_DEPTH
+
+class HashingExecutor:
+    """Bounded thread pool that keeps bcrypt work off the event loop."""
+    
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        # Counters are updated from worker threads when calls finish
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+    
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a hashing function in the pool, rejecting the call when the queue is full."""
+        with self._lock:
+            admitted = self._pending < self.max_pending
+            if admitted:
+                self._pending += 1
+            else:
+                self._rejected += 1
+        if not admitted:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service is busy, please retry",
+                headers={"Retry-After": "1"}
+            )
+        
+        start = time.perf_counter()
+        future = self._executor.submit(fn, *args)
+        # Count the call until the worker is done with it, even if the caller stops waiting
+        future.add_done_callback(lambda done: self._finish(start))
+        return await asyncio.wrap_future(future)
+    
+    def _finish(self, start: float):
+        """Record a call that left the pool, whether it ran or was cancelled while queued."""
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+        HASH_LATENCY.observe(elapsed)
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Return queue depth and latency counters."""
+        return {
+            "workers": self.workers,
+            "in_flight": min(self._pending, self.workers),
+            "queue_depth": max(self._pending - self.workers, 0),
+            "max_pending": self.max_pending,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_latency_seconds": self._total_seconds / self._completed if self._completed else 0.0,
+            "max_latency_seconds": self._max_seconds
+        }
+    
+    def shutdown(self):
+        """Stop the worker threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# Global password hashing executor
+hashing_executor = HashingExecutor(settings.password_hash_workers, settings.password_hash_queue_size)
+HASH_QUEUE_DEPTH.set_function(lambda: hashing_executor.metrics()["queue_depth"])
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from config import settings
+from database import engine, replica_engines
+from chatbot import chatbot
+
+logger = logging.getLogger(__name__)
+
+def request_engines() -> Dict[str, object]:
+    """Return the request-path engines by the name their pools are reported under."""
+    engines = {"primary": engine}
+    for index, replica in enumerate(replica_engines):
+        engines[f"replica{index}"] = replica
+    return engines
+
+class HealthProbe:
+    """Readiness checks run in the background; probes are answered from the latest result."""
+    
+    def __init__(self, interval_seconds: float, timeout_seconds: float, saturation_threshold: float):
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+        self.saturation_threshold = saturation_threshold
+        self.result: Dict = {"status": "starting", "ready": False, "checked_at": None}
+        self._engines: Dict[str, object] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    async def ping(self, probe_engine):
+        """Open a fresh connection and run SELECT 1."""
+        async with probe_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    
+    async def check_database(self, name: str, probe_engine) -> Dict:
+        """Ping a database outside the request pool, giving up after the timeout."""
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.ping(probe_engine), timeout=self.timeout_seconds)
+        except Exception as e:
+            logger.warning(f"Health probe for {name} database failed: {e!r}")
+            return {"status": "unavailable", "error": type(e).__name__}
+        return {"status": "ok", "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+    
+    def check_pool(self, pool) -> Dict:
+        """Report how much of a request pool's capacity is checked out."""
+        if not hasattr(pool, "max_overflow"):
+            return {"status": "ok"}
+        checked_out = pool.checkedout()
+        capacity = pool.size() + max(pool.max_overflow, 0)
+        usage = checked_out / capacity if capacity else 0.0
+        return {
+            "status": "saturated" if usage >= self.saturation_threshold else "ok",
+            "checked_out": checked_out,
+            "capacity": capacity
+        }
+    
+    async def refresh(self) -> Dict:
+        """Run every check and publish the combined result."""
+        names = list(self._engines)
+        results = await asyncio.gather(*(self.check_database(name, self._engines[name]) for name in names))
+        databases = dict(zip(names, results))
+        pools = {name: self.check_pool(created.sync_engine.pool) for name, created in request_engines().items()}
+        backend = chatbot.status()
+
+        # A failing completion backend degrades replies to keywords but does not stop traffic
+        ready = all(check["status"] == "ok" for check in [*databases.values(), *pools.values()])
+        status = "ready" if ready and backend["status"] == "ok" else "degraded" if ready else "unavailable"
+        self.result = {
+            "status": status,
+            "ready": ready,
+            "checked_at": time.time(),
+            "databases": databases,
+            "pools": pools,
+            "chatbot": backend
+        }
+        return self.result
+    
+    async def _run(self):
+        """Refresh the result every interval."""
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Health probe failed: {e!r}")
+    
+    async def start(self):
+        """Run the first check, then keep refreshing in the background."""
+        if self._task is not None:
+            return
+        # Dedicated unpooled engines, so probes never take request-path connections
+        self._engines = {
+            name: create_async_engine(created.url, poolclass=NullPool)
+            for name, created in request_engines().items()
+        }
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop refreshing and close the probe engines."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for probe_engine in self._engines.values():
+            await probe_engine.dispose()
+        self._engines = {}
+
+# Global health probe
+health_probe = HealthProbe(
+    settings.health_probe_interval_seconds,
+    settings.health_probe_timeout_seconds,
+    settings.pool_saturation_threshold
+)
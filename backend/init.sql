@@ -16,7 +16,8 @@ CREATE TABLE IF NOT EXISTS users (
     is_admin BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_email (email)
+    INDEX idx_email (email),
+    INDEX idx_users_created_id (created_at, id)
 );
 
 CREATE TABLE IF NOT EXISTS sessions (
@@ -27,7 +28,19 @@ CREATE TABLE IF NOT EXISTS sessions (
     ended_at TIMESTAMP NULL,
     is_active BOOLEAN DEFAULT TRUE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-    INDEX idx_user_id (user_id)
+    INDEX idx_user_id (user_id),
+    INDEX idx_sessions_user_started (user_id, started_at)
+);
+
+-- Canned bot responses, referenced by messages instead of copied into them
+CREATE TABLE IF NOT EXISTS response_catalog (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    version INT NOT NULL,
+    category VARCHAR(50) NOT NULL,
+    position INT NOT NULL,
+    text TEXT NOT NULL,
+    UNIQUE KEY uq_response_catalog_entry (version, category, position),
+    FULLTEXT INDEX ft_response_catalog_text (text)
 );
 
 CREATE TABLE IF NOT EXISTS messages (
@@ -35,14 +48,46 @@ CREATE TABLE IF NOT EXISTS messages (
     user_id INT NOT NULL,
     message_text TEXT NOT NULL,
     response_text TEXT,
+    response_ref_id INT,
     session_id INT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE SET NULL,
+    CONSTRAINT fk_messages_response_ref FOREIGN KEY (response_ref_id) REFERENCES response_catalog(id),
     INDEX idx_user_id (user_id),
     INDEX idx_session_id (session_id),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_messages_user_created_id (user_id, created_at, id),
+    INDEX idx_messages_created_id (created_at, id),
+    INDEX idx_messages_session_user_created (session_id, user_id, created_at, id),
+    FULLTEXT INDEX ft_messages_text (message_text, response_text)
+);
+
+CREATE TABLE IF NOT EXISTS daily_message_counts (
+    user_id INT NOT NULL,
+    day DATE NOT NULL,
+    message_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_day (day)
+);
+
+CREATE TABLE IF NOT EXISTS id_allocations (
+    name VARCHAR(50) PRIMARY KEY,
+    next_id INT NOT NULL
+);
+
+-- Backfill the daily message rollup from existing messages
+INSERT INTO daily_message_counts (user_id, day, message_count)
+SELECT user_id, DATE(created_at), COUNT(*) FROM messages GROUP BY user_id, DATE(created_at)
+ON DUPLICATE KEY UPDATE message_count = VALUES(message_count);
+
+-- Record the migration this script corresponds to (see migrations/versions)
+CREATE TABLE IF NOT EXISTS alembic_version (
+    version_num VARCHAR(32) NOT NULL PRIMARY KEY
 );
+DELETE FROM alembic_version;
+INSERT INTO alembic_version (version_num) VALUES ('0003');
 
 -- Insert sample admin user (password: admin123)
 INSERT INTO users (username, email, password_hash, is_admin) VALUES 
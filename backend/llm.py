@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+import httpx
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class CompletionError(Exception):
+    """Raised when a completion backend cannot produce a response."""
+
+class CompletionBackend(ABC):
+    """Interface for services that generate chatbot responses."""
+    
+    name = "base"
+    
+    @abstractmethod
+    async def complete(self, message: str, user_context: Dict = None) -> str:
+        """Return a response for the message."""
+    
+    def status(self) -> Dict:
+        """Report the backend's health without calling out to it."""
+        return {"status": "ok"}
+    
+    async def close(self):
+        """Release any resources held by the backend."""
+
+class HTTPCompletionBackend(CompletionBackend):
+    """Completion backend calling an HTTP service through a shared, pooled client.
+    
+    The service receives ``{"message": ..., "context": {...}}`` as JSON and
+    answers with ``{"response": "..."}``.
+    """
+    
+    name = "http"
+    
+    def __init__(
+        self,
+        url: str,
+        timeout_seconds: float = 10.0,
+        max_retries: int = 2,
+        max_concurrency: int = 32,
+        max_connections: int = 64
+    ):
+        self.url = url
+        self.max_retries = max_retries
+        self.timeout_seconds = timeout_seconds
+        self.max_concurrency = max_concurrency
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout_seconds),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=30.0
+            )
+        )
+    
+    async def _post(self, payload: dict) -> str:
+        """Make one completion request."""
+        response = await self._client.post(self.url, json=payload)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise httpx.HTTPStatusError(
+                f"Completion service returned {response.status_code}",
+                request=response.request,
+                response=response
+            )
+        response.raise_for_status()
+        return response.json()["response"]
+    
+    async def complete(self, message: str, user_context: Dict = None) -> str:
+        """Request a completion, retrying transient failures with jittered backoff."""
+        payload = {"message": message, "context": user_context or {}}
+        
+        # Bound fan-out to the model server; waiting longer than a request would take is pointless
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            raise CompletionError("Completion service concurrency limit reached")
+        
+        self.in_flight += 1
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._post(payload)
+                    self.consecutive_failures = 0
+                    return response
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    retryable = not isinstance(e, httpx.HTTPStatusError) or (
+                        e.response.status_code == 429 or e.response.status_code >= 500
+                    )
+                    if not retryable or attempt == self.max_retries:
+                        self.consecutive_failures += 1
+                        raise CompletionError(str(e)) from e
+                    # Full jitter: spread retries so callers do not stampede together
+                    await asyncio.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+                except (KeyError, ValueError) as e:
+                    self.consecutive_failures += 1
+                    raise CompletionError(f"Malformed completion response: {e}") from e
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+    
+    def status(self) -> Dict:
+        """Report recent failures and concurrency in use."""
+        return {
+            "status": "failing" if self.consecutive_failures >= 3 else "ok",
+            "consecutive_failures": self.consecutive_failures,
+            "in_flight": self.in_flight
+        }
+    
+    async def close(self):
+        """Close pooled connections."""
+        await self._client.aclose()
+
+def create_backend() -> Optional[CompletionBackend]:
+    """Build the completion backend selected in settings, or None for keywords only."""
+    if settings.chatbot_backend == "http":
+        return HTTPCompletionBackend(
+            settings.llm_url,
+            timeout_seconds=settings.llm_timeout_seconds,
+            max_retries=settings.llm_max_retries,
+            max_concurrency=settings.llm_max_concurrency,
+            max_connections=settings.llm_max_connections
+        )
+    return None
@@ -0,0 +1,24 @@
+"""Local stand-in for the completion service.
+
+Run with ``uvicorn llm_stub:app --port 8001`` and set
+``CHATBOT_BACKEND=http`` and ``LLM_URL=http://localhost:8001/complete``.
+"""
+import asyncio
+from typing import Dict
+from fastapi import FastAPI
+from pydantic import BaseModel
+
+app = FastAPI(title="Completion Service Stub")
+
+class CompletionRequest(BaseModel):
+    message: str
+    context: Dict = {}
+
+@app.post("/complete")
+async def complete(request: CompletionRequest):
+    """Echo the message back after a short delay, recalling the previous turn if any."""
+    await asyncio.sleep(0.05)
+    name = request.context.get("username", "there")
+    history = request.context.get("history") or []
+    recall = f" (earlier you said: {history[-1]['user']})" if history else ""
+    return {"response": f"Hi {name}, you said: {request.message}{recall}"}
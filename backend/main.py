@@ -1,13 +1,29 @@
+import time
+from contextlib import contextmanager
+
+# Taken before the heavy imports below so cold-start time includes them
+IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy import text
-from database import engine, get_db
-from models import Base
+from fastapi.responses import JSONResponse, Response
+from database import engine, SessionLocal, dispose_engines, warm_pools
+from schema import verify_schema
+from compression import warn_if_compressing
+from hashing import hashing_executor
+from message_writer import message_writer
+from chatbot import chatbot
+from health import health_probe
+from cache_backend import cache_backend, invalidation_bus
+from response_catalog import response_catalog
+from metrics import COLD_START_SECONDS, track_request, render_metrics
+from query_stats import track_queries
 from routers import auth, chat, admin
 from config import settings
 import logging
 
+APP_IMPORTED = time.perf_counter()
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,41 +44,93 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Create database tables
+# Record per-route latency, in-flight requests and per-request query counts
+app.middleware("http")(track_queries)
+app.middleware("http")(track_request)
+
+@contextmanager
+def cold_start_phase(phase: str):
+    """Record how long a startup phase takes."""
+    started = time.perf_counter()
+    yield
+    COLD_START_SECONDS.labels(phase).set(time.perf_counter() - started)
+
+# Verify the schema and warm up before serving traffic
 @app.on_event("startup")
 async def startup_event():
-    """Create database tables on startup."""
-    try:
-        Base.metadata.create_all(bind=engine)
-        logger.info("Database tables created successfully")
-    except Exception as e:
-        logger.error(f"Error creating database tables: {e}")
+    """Check the schema version, warm connections, caches and the chatbot, and report cold-start time."""
+    COLD_START_SECONDS.labels("imports").set(APP_IMPORTED - IMPORT_STARTED)
+    with cold_start_phase("schema"):
+        await verify_schema(engine)
+        warn_if_compressing(settings.message_compression_threshold)
+    with cold_start_phase("pool"):
+        await warm_pools()
+    with cold_start_phase("chatbot"):
+        chatbot.warm_up()
+        async with SessionLocal() as db:
+            await response_catalog.sync(db, chatbot.responses)
+    with cold_start_phase("cache"):
+        await invalidation_bus.start()
+    with cold_start_phase("health"):
+        await health_probe.start()
+    
+    if settings.message_write_behind:
+        message_writer.start()
+    
+    cold_start = time.perf_counter() - IMPORT_STARTED
+    COLD_START_SECONDS.labels("total").set(cold_start)
+    logger.info(f"Cold start completed in {cold_start:.3f}s")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain buffered messages, then release connections and worker threads."""
+    await health_probe.stop()
+    await message_writer.stop()
+    await invalidation_bus.drain()
+    await cache_backend.close()
+    await chatbot.close()
+    await dispose_engines()
+    hashing_executor.shutdown()
 
 # Include routers
 app.include_router(auth.router)
 app.include_router(chat.router)
 app.include_router(admin.router)
 
-# Health check endpoint
+# Health check endpoints, answered from the background probe without touching the database
+@app.get("/livez")
+async def liveness_check():
+    """Liveness probe: the event loop is serving requests."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness_check():
+    """Readiness probe with the latest database, pool and chatbot backend checks."""
+    result = health_probe.result
+    return JSONResponse(status_code=200 if result["ready"] else 503, content=result)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    try:
-        # Test database connection
-        db = next(get_db())
-        db.execute(text("SELECT 1"))
-        db.close()
-        
-        return {
-            "status": "healthy",
-            "environment": settings.environment,
-            "database": "connected"
-        }
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
+    databases = health_probe.result.get("databases", {})
+    if databases.get("primary", {}).get("status") != "ok":
         raise HTTPException(status_code=503, detail="Service unavailable")
+    
+    return {
+        "status": "healthy",
+        "environment": settings.environment,
+        "database": "connected"
+    }
+
+# Prometheus metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Expose metrics in Prometheus text format."""
+    body, content_type = render_metrics()
+    return Response(content=body, headers={"Content-Type": content_type})
 
 # Root endpoint
 @app.get("/")
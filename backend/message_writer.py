@@ -0,0 +1,166 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, List, Optional
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import settings
+from cache import conversation_cache
+from crud import (
+    conversation_turn, create_message, create_messages_bulk, invalidate_conversation, message_timestamp,
+    reserve_id_block
+)
+from database import SessionLocal
+from models import Message
+from response_catalog import response_catalog
+from schemas import MessageCreate
+
+logger = logging.getLogger(__name__)
+
+class MessageWriter:
+    """Write-behind buffer that persists chat messages in batched multi-row INSERTs.
+    
+    Ids come from blocks reserved in the id_allocations table, so callers get a
+    complete message immediately; the row becomes visible to readers once the
+    next flush commits, at most ``flush_interval_ms`` later.
+    """
+    
+    def __init__(self, batch_size: int, flush_interval_ms: int, id_block_size: int, max_buffer_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.id_block_size = id_block_size
+        self.max_buffer_size = max_buffer_size
+        self._buffer: List[dict] = []
+        # Rows that failed on their own, kept for inspection instead of blocking later flushes
+        self.rejected: Deque[dict] = deque(maxlen=max(batch_size, 1))
+        self._next_id = 0
+        self._end_id = 0
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+    
+    async def _allocate_id(self) -> int:
+        """Return the next id from the current block, reserving a new block when exhausted."""
+        async with self._id_lock:
+            while self._next_id >= self._end_id:
+                try:
+                    async with SessionLocal() as db:
+                        self._next_id, self._end_id = await reserve_id_block(db, "messages", self.id_block_size)
+                except IntegrityError:
+                    # Another process created the allocation row first; retry against it
+                    continue
+            message_id = self._next_id
+            self._next_id += 1
+            return message_id
+    
+    async def enqueue(self, user_id: int, message: MessageCreate, response_text: str = None) -> Message:
+        """Buffer a message for the next flush and return it with its final id."""
+        response_ref_id, stored_response_text = response_catalog.split(response_text)
+        row = {
+            "id": await self._allocate_id(),
+            "user_id": user_id,
+            "message_text": message.message_text,
+            "stored_response_text": stored_response_text,
+            "response_ref_id": response_ref_id,
+            "session_id": message.session_id,
+            "created_at": message_timestamp()
+        }
+        self._buffer.append(row)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return Message(**row, response_text=response_text)
+    
+    async def write_through(self, db: AsyncSession, user_id: int, message: MessageCreate, response_text: str = None) -> Message:
+        """Write a message immediately, with an id from the reserved blocks so it cannot collide with buffered rows."""
+        return await create_message(db, user_id, message, response_text, message_id=await self._allocate_id())
+    
+    def full(self) -> bool:
+        """Whether the buffer has reached its cap and new messages should bypass it."""
+        return self.max_buffer_size > 0 and len(self._buffer) >= self.max_buffer_size
+    
+    async def _insert(self, rows: List[dict]):
+        """Insert rows, splitting a failed batch so that only rows failing on their own are set aside."""
+        try:
+            async with SessionLocal() as db:
+                await create_messages_bulk(db, rows)
+        except OperationalError:
+            # The database itself is unavailable; the whole batch is retried later
+            raise
+        except Exception as e:
+            if len(rows) == 1:
+                logger.error(f"Setting aside message {rows[0]['id']} that cannot be written: {e}")
+                self.rejected.append(rows[0])
+                return
+            middle = len(rows) // 2
+            await self._insert(rows[:middle])
+            await self._insert(rows[middle:])
+    
+    async def flush(self):
+        """Write all buffered messages to the database."""
+        async with self._flush_lock:
+            rows, self._buffer = self._buffer, []
+            if not rows:
+                return
+            try:
+                await self._insert(rows)
+            except Exception as e:
+                # Keep the rows for the next attempt rather than dropping them
+                logger.error(f"Failed to flush {len(rows)} messages: {e}")
+                self._buffer[:0] = rows
+            except BaseException:
+                # Cancelled mid-write; the rows go back so a later flush can retry them
+                self._buffer[:0] = rows
+                raise
+    
+    async def _run(self):
+        """Flush every interval, or sooner when a full batch is waiting, until stopped."""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+    
+    def start(self):
+        """Start the background flush loop."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Stop the flush loop and drain the buffer."""
+        if self._task is not None:
+            # Let the loop finish its current flush instead of cancelling it mid-write
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+            self._stopping = False
+        await self.flush()
+        if self._buffer:
+            logger.error(f"{len(self._buffer)} buffered messages could not be written on shutdown")
+
+# Global message writer, used when write-behind persistence is enabled
+message_writer = MessageWriter(
+    settings.message_batch_size,
+    settings.message_flush_interval_ms,
+    settings.message_id_block_size,
+    settings.message_buffer_max_size
+)
+
+async def save_message(db: AsyncSession, user_id: int, message: MessageCreate, response_text: str = None) -> Message:
+    """Persist a chat message directly or through the write-behind buffer."""
+    if settings.message_write_behind and not message_writer.full():
+        saved = await message_writer.enqueue(user_id, message, response_text)
+    elif settings.message_write_behind:
+        # Autoincrement would hand out ids already taken by buffered rows
+        saved = await message_writer.write_through(db, user_id, message, response_text)
+    else:
+        saved = await create_message(db, user_id, message, response_text)
+    if saved.session_id is not None:
+        conversation_cache.append(saved.session_id, conversation_turn(saved))
+        # Other workers reload the session's turns on their next read
+        invalidate_conversation(saved.session_id, local=False)
+    return saved
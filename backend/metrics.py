@@ -0,0 +1,137 @@
+import time
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+from starlette.routing import Match
+
+# HTTP metrics
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response starts",
+    ["method", "route", "status"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being handled",
+    ["method", "route"]
+)
+
+REQUESTS_SHED = Counter(
+    "http_requests_shed_total",
+    "Requests rejected by rate limiting or admission control",
+    ["reason"]
+)
+
+# Database pool metrics
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting to check a connection out of the pool",
+    ["pool"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+# Chatbot metrics
+CHATBOT_LATENCY = Histogram(
+    "chatbot_response_duration_seconds",
+    "Time to generate a chatbot response",
+    ["category"]
+)
+
+# Password hashing metrics
+HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds",
+    "Time from submitting a password hash or verify until it completes, including queueing"
+)
+HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth",
+    "Password hash calls waiting for a worker"
+)
+
+# Auth metrics
+AUTH_FAILURES = Counter(
+    "auth_failures_total",
+    "Failed authentication attempts",
+    ["reason"]
+)
+
+# Startup metrics
+COLD_START_SECONDS = Gauge(
+    "app_cold_start_seconds",
+    "Time spent in each cold-start phase",
+    ["phase"]
+)
+
+class PoolCollector:
+    """Expose SQLAlchemy pool usage as gauges at scrape time."""
+    
+    def __init__(self):
+        self._pools = {}
+    
+    def register(self, name: str, pool):
+        """Start reporting a connection pool under ``name``."""
+        self._pools[name] = pool
+    
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections checked out of the pool", labels=["pool"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections open beyond the pool size", labels=["pool"])
+        size = GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["pool"])
+        for name, pool in self._pools.items():
+            # Only queue-based pools track usage; SQLite's may not
+            if hasattr(pool, "checkedout"):
+                checked_out.add_metric([name], pool.checkedout())
+                overflow.add_metric([name], max(pool.overflow(), 0))
+                size.add_metric([name], pool.size())
+        return [checked_out, overflow, size]
+
+pool_collector = PoolCollector()
+REGISTRY.register(pool_collector)
+
+class CoalescingCollector:
+    """Expose request coalescing counters at scrape time; the hit rate is coalesced over calls."""
+    
+    def __init__(self):
+        self._flights = {}
+    
+    def register(self, name: str, flight):
+        """Start reporting a SingleFlight under ``name``."""
+        self._flights[name] = flight
+    
+    def collect(self):
+        calls = CounterMetricFamily("coalescing_calls", "Calls made through request coalescing", labels=["name"])
+        coalesced = CounterMetricFamily("coalescing_coalesced", "Calls that shared a computation already in flight", labels=["name"])
+        in_flight = GaugeMetricFamily("coalescing_in_flight", "Distinct computations currently in flight", labels=["name"])
+        for name, flight in self._flights.items():
+            stats = flight.metrics()
+            calls.add_metric([name], stats["calls"])
+            coalesced.add_metric([name], stats["coalesced"])
+            in_flight.add_metric([name], stats["in_flight"])
+        return [calls, coalesced, in_flight]
+
+coalescing_collector = CoalescingCollector()
+REGISTRY.register(coalescing_collector)
+
+def route_template(app, scope) -> str:
+    """Return the path template of the route matching a request, to keep label cardinality low."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+async def track_request(request, call_next):
+    """HTTP middleware recording per-route latency and in-flight counts."""
+    route = route_template(request.app, request.scope)
+    in_flight = REQUESTS_IN_FLIGHT.labels(request.method, route)
+    in_flight.inc()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        in_flight.dec()
+        REQUEST_LATENCY.labels(request.method, route, str(status_code)).observe(time.perf_counter() - start)
+
+def render_metrics():
+    """Return the registry in Prometheus text exposition format."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,132 @@
+"""initial schema
+
+Creates every table, the keyset and rollup indexes, and full-text search
+(a FULLTEXT index on MySQL, an FTS5 table with sync triggers on SQLite).
+Databases created earlier by create_all or init.sql are adopted: tables and
+indexes that already exist are left alone, and the rollup is backfilled when
+its table is new.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+SQLITE_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+    "message_text, response_text, content='messages', content_rowid='id')",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN "
+    "INSERT INTO messages_fts(rowid, message_text, response_text) "
+    "VALUES (new.id, new.message_text, new.response_text); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, message_text, response_text) "
+    "VALUES ('delete', old.id, old.message_text, old.response_text); END",
+    "CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE ON messages BEGIN "
+    "INSERT INTO messages_fts(messages_fts, rowid, message_text, response_text) "
+    "VALUES ('delete', old.id, old.message_text, old.response_text); "
+    "INSERT INTO messages_fts(rowid, message_text, response_text) "
+    "VALUES (new.id, new.message_text, new.response_text); END",
+]
+
+def create_index_if_missing(name: str, table: str, columns, **kw):
+    """Create an index unless a database being adopted already has it."""
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+    if name not in existing:
+        op.create_index(name, table, columns, **kw)
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("username", sa.String(50), nullable=False),
+            sa.Column("email", sa.String(100), nullable=False),
+            sa.Column("password_hash", sa.String(255), nullable=False),
+            sa.Column("is_active", sa.Boolean()),
+            sa.Column("is_admin", sa.Boolean()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_username", "users", ["username"], unique=True)
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if "sessions" not in tables:
+        op.create_table(
+            "sessions",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("title", sa.String(200)),
+            sa.Column("started_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("ended_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("is_active", sa.Boolean()),
+        )
+        op.create_index("ix_sessions_id", "sessions", ["id"])
+
+    if "messages" not in tables:
+        op.create_table(
+            "messages",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("message_text", sa.Text(), nullable=False),
+            sa.Column("response_text", sa.Text(), nullable=True),
+            sa.Column("session_id", sa.Integer(), sa.ForeignKey("sessions.id"), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_messages_id", "messages", ["id"])
+
+    if "daily_message_counts" not in tables:
+        op.create_table(
+            "daily_message_counts",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("day", sa.Date(), primary_key=True),
+            sa.Column("message_count", sa.Integer(), nullable=False),
+        )
+        op.create_index("ix_daily_message_counts_day", "daily_message_counts", ["day"])
+        op.execute(
+            "INSERT INTO daily_message_counts (user_id, day, message_count) "
+            "SELECT user_id, DATE(created_at), COUNT(*) FROM messages GROUP BY user_id, DATE(created_at)"
+        )
+
+    if "id_allocations" not in tables:
+        op.create_table(
+            "id_allocations",
+            sa.Column("name", sa.String(50), primary_key=True),
+            sa.Column("next_id", sa.Integer(), nullable=False),
+        )
+
+    # Keyset pagination indexes
+    create_index_if_missing("idx_users_created_id", "users", ["created_at", "id"])
+    create_index_if_missing("idx_messages_user_created_id", "messages", ["user_id", "created_at", "id"])
+    create_index_if_missing("idx_messages_created_id", "messages", ["created_at", "id"])
+
+    # Full-text search
+    if bind.dialect.name == "mysql":
+        create_index_if_missing(
+            "ft_messages_text", "messages", ["message_text", "response_text"], mysql_prefix="FULLTEXT"
+        )
+    elif bind.dialect.name == "sqlite":
+        fts_exists = "messages_fts" in tables
+        for statement in SQLITE_FTS_DDL:
+            op.execute(statement)
+        if not fts_exists:
+            op.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        for trigger in ("messages_fts_ai", "messages_fts_ad", "messages_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS messages_fts")
+    op.drop_table("id_allocations")
+    op.drop_table("daily_message_counts")
+    op.drop_table("messages")
+    op.drop_table("sessions")
+    op.drop_table("users")
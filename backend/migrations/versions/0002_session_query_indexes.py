@@ -0,0 +1,32 @@
+"""session query indexes
+
+Composite indexes for listing a user's sessions newest first and for reading
+a session's messages in order, so neither needs a filesort.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def create_index_if_missing(name: str, table: str, columns, **kw):
+    """Create an index unless the database already has it, e.g. from the root SQL scripts."""
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+    if name not in existing:
+        op.create_index(name, table, columns, **kw)
+
+def upgrade():
+    create_index_if_missing("idx_sessions_user_started", "sessions", ["user_id", "started_at"])
+    create_index_if_missing(
+        "idx_messages_session_user_created", "messages", ["session_id", "user_id", "created_at", "id"]
+    )
+
+def downgrade():
+    op.drop_index("idx_messages_session_user_created", table_name="messages")
+    op.drop_index("idx_sessions_user_started", table_name="sessions")
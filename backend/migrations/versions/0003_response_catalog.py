@@ -0,0 +1,81 @@
+"""response catalog
+
+Adds the versioned response catalog and messages.response_ref_id, so canned
+bot responses are stored as a reference instead of a full copy per row. The
+SQLite full-text triggers now index the referenced catalog text; on MySQL the
+catalog gets its own FULLTEXT index. Existing rows keep their inline text
+until backfill_responses.py converts them.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+FTS_TRIGGERS = ("messages_fts_ai", "messages_fts_ad", "messages_fts_au")
+
+RESPONSE = "coalesce({row}.response_text, (SELECT text FROM response_catalog WHERE id = {row}.response_ref_id))"
+
+def sqlite_fts_triggers(new_response: str, old_response: str):
+    """Return the FTS5 sync triggers indexing the given response expressions."""
+    return [
+        "CREATE TRIGGER messages_fts_ai AFTER INSERT ON messages BEGIN "
+        "INSERT INTO messages_fts(rowid, message_text, response_text) "
+        f"VALUES (new.id, new.message_text, {new_response}); END",
+        "CREATE TRIGGER messages_fts_ad AFTER DELETE ON messages BEGIN "
+        "INSERT INTO messages_fts(messages_fts, rowid, message_text, response_text) "
+        f"VALUES ('delete', old.id, old.message_text, {old_response}); END",
+        "CREATE TRIGGER messages_fts_au AFTER UPDATE ON messages BEGIN "
+        "INSERT INTO messages_fts(messages_fts, rowid, message_text, response_text) "
+        f"VALUES ('delete', old.id, old.message_text, {old_response}); "
+        "INSERT INTO messages_fts(rowid, message_text, response_text) "
+        f"VALUES (new.id, new.message_text, {new_response}); END",
+    ]
+
+def replace_sqlite_fts_triggers(statements):
+    for trigger in FTS_TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    for statement in statements:
+        op.execute(statement)
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    op.create_table(
+        "response_catalog",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("category", sa.String(50), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("text", sa.Text(), nullable=False),
+        sa.UniqueConstraint("version", "category", "position", name="uq_response_catalog_entry"),
+    )
+    with op.batch_alter_table("messages") as batch:
+        batch.add_column(sa.Column("response_ref_id", sa.Integer(), nullable=True))
+        batch.create_foreign_key("fk_messages_response_ref", "response_catalog", ["response_ref_id"], ["id"])
+
+    if dialect == "mysql":
+        op.create_index("ft_response_catalog_text", "response_catalog", ["text"], mysql_prefix="FULLTEXT")
+    elif dialect == "sqlite":
+        # Runs after the batch because SQLite rebuilds the table, dropping its triggers
+        replace_sqlite_fts_triggers(sqlite_fts_triggers(RESPONSE.format(row="new"), RESPONSE.format(row="old")))
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    # Put referenced responses back inline before dropping the references
+    op.execute(
+        "UPDATE messages SET response_text = "
+        "(SELECT text FROM response_catalog WHERE response_catalog.id = messages.response_ref_id) "
+        "WHERE response_ref_id IS NOT NULL"
+    )
+    with op.batch_alter_table("messages") as batch:
+        batch.drop_constraint("fk_messages_response_ref", type_="foreignkey")
+        batch.drop_column("response_ref_id")
+    if dialect == "sqlite":
+        replace_sqlite_fts_triggers(sqlite_fts_triggers("new.response_text", "old.response_text"))
+    op.drop_table("response_catalog")
@@ -1,8 +1,18 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, Date, DateTime, ForeignKey, Boolean, Index, UniqueConstraint, select
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy.sql import func
+from compression import CompressedText
+from config import settings
 from database import Base
 
+# SQLite stores CURRENT_TIMESTAMP without fractional seconds; bind values in the
+# same format so equality comparisons (e.g. keyset cursors) match stored rows
+Timestamp = DateTime(timezone=True).with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -12,25 +22,56 @@ class User(Base):
     password_hash = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
     
     # Relationships
     messages = relationship("Message", back_populates="user")
     sessions = relationship("Session", back_populates="user")
+    
+    __table_args__ = (
+        Index("idx_users_created_id", "created_at", "id"),
+    )
+
+class ResponseCatalogEntry(Base):
+    __tablename__ = "response_catalog"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    category = Column(String(50), nullable=False)
+    position = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint("version", "category", "position", name="uq_response_catalog_entry"),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    message_text = Column(Text, nullable=False)
-    response_text = Column(Text, nullable=True)
+    message_text = Column(CompressedText(settings.message_compression_threshold), nullable=False)
+    # Only free-form responses are stored inline; catalog responses are referenced
+    stored_response_text = Column("response_text", CompressedText(settings.message_compression_threshold), nullable=True)
+    response_ref_id = Column(Integer, ForeignKey("response_catalog.id"), nullable=True)
     session_id = Column(Integer, ForeignKey("sessions.id"), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(Timestamp, server_default=func.now())
+    
+    # The response text, materialized from the catalog when referenced
+    response_text = column_property(func.coalesce(
+        stored_response_text,
+        select(ResponseCatalogEntry.text).where(ResponseCatalogEntry.id == response_ref_id).scalar_subquery()
+    ))
     
     # Relationships
     user = relationship("User", back_populates="messages")
     session = relationship("Session", back_populates="messages")
+    
+    __table_args__ = (
+        Index("idx_messages_user_created_id", "user_id", "created_at", "id"),
+        Index("idx_messages_created_id", "created_at", "id"),
+        Index("idx_messages_session_user_created", "session_id", "user_id", "created_at", "id"),
+    )
 
 class Session(Base):
     __tablename__ = "sessions"
@@ -38,10 +79,27 @@ class Session(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String(200), default="New Chat")
-    started_at = Column(DateTime(timezone=True), server_default=func.now())
-    ended_at = Column(DateTime(timezone=True), nullable=True)
+    started_at = Column(Timestamp, server_default=func.now())
+    ended_at = Column(Timestamp, nullable=True)
     is_active = Column(Boolean, default=True)
     
     # Relationships
     user = relationship("User", back_populates="sessions")
     messages = relationship("Message", back_populates="session")
+    
+    __table_args__ = (
+        Index("idx_sessions_user_started", "user_id", "started_at"),
+    )
+
+class DailyMessageCount(Base):
+    __tablename__ = "daily_message_counts"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True, index=True)
+    message_count = Column(Integer, nullable=False, default=0)
+
+class IdAllocation(Base):
+    __tablename__ = "id_allocations"
+    
+    name = Column(String(50), primary_key=True)
+    next_id = Column(Integer, nullable=False)
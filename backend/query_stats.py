@@ -0,0 +1,91 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+from sqlalchemy import event
+from config import settings
+from metrics import route_template
+
+logger = logging.getLogger(__name__)
+
+class QueryStats:
+    """Query count and database time accumulated for one request or capture."""
+    
+    def __init__(self, route: str, record_statements: bool = False):
+        self.route = route
+        self.count = 0
+        self.total_seconds = 0.0
+        self.statements: Optional[List[str]] = [] if record_statements else None
+    
+    def record(self, statement: str, elapsed: float):
+        """Account for one executed statement."""
+        self.count += 1
+        self.total_seconds += elapsed
+        if self.statements is not None:
+            self.statements.append(statement)
+
+# Stats for the request being handled in the current context
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar("current_query_stats", default=None)
+
+# Captures opened by capture_queries, which see queries from every context and thread
+active_captures: List[QueryStats] = []
+
+def instrument_engine(sync_engine):
+    """Hook query timing onto an engine's cursor execution events."""
+    
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_times", []).append(time.perf_counter())
+    
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_times"].pop()
+        stats = current_stats.get()
+        if stats is not None:
+            stats.record(statement, elapsed)
+        for capture in active_captures:
+            capture.record(statement, elapsed)
+        
+        if elapsed * 1000 >= settings.slow_query_threshold_ms:
+            route = stats.route if stats is not None else "-"
+            logger.warning(f"Slow query ({elapsed * 1000:.1f} ms) on {route}: {statement}")
+
+async def track_queries(request, call_next):
+    """HTTP middleware counting queries per request and flagging requests over budget."""
+    stats = QueryStats(route_template(request.app, request.scope))
+    token = current_stats.set(stats)
+    try:
+        return await call_next(request)
+    finally:
+        current_stats.reset(token)
+        if stats.count > settings.query_budget_per_request:
+            logger.warning(
+                f"{request.method} {stats.route} ran {stats.count} queries "
+                f"({stats.total_seconds * 1000:.1f} ms), over the budget of {settings.query_budget_per_request}"
+            )
+
+@contextmanager
+def capture_queries():
+    """Collect every query executed while the block runs, e.g. around a test client call."""
+    stats = QueryStats("capture", record_statements=True)
+    active_captures.append(stats)
+    try:
+        yield stats
+    finally:
+        active_captures.remove(stats)
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """Fail with the executed statements if the block runs more than ``limit`` queries.
+    
+    Usage in tests::
+    
+        with assert_max_queries(3):
+            client.get("/chat/sessions", headers=headers)
+    """
+    with capture_queries() as stats:
+        yield stats
+    assert stats.count <= limit, (
+        f"Expected at most {limit} queries, got {stats.count}:\n" + "\n".join(stats.statements)
+    )
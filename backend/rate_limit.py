@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import math
+import time
+from typing import Callable, Optional
+from cache_backend import CacheBackend, CacheError, cache_backend
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """Per-key token bucket of ``burst`` requests refilling at ``rate_per_second``, kept in the cache backend.
+    
+    The bucket is approximated with two fixed windows of ``burst / rate_per_second``
+    seconds: the previous window's count is weighted by how much of it the sliding
+    window still covers. That needs only INCR and GET, so the limit holds across
+    every worker sharing the backend.
+    """
+    
+    def __init__(self, backend: CacheBackend, name: str, rate_per_second: float, burst: int):
+        self.backend = backend
+        self.name = name
+        self.rate_per_second = rate_per_second
+        self.burst = max(burst, 1)
+        self.window_seconds = self.burst / rate_per_second if rate_per_second > 0 else 0.0
+    
+    def retry_after(self, count: int, previous: int, elapsed: float) -> float:
+        """Seconds until one more request fits, given the window counts and the elapsed fraction."""
+        if count + 1 <= self.burst and previous:
+            # Wait for enough of the previous window to slide out
+            wait = 1 - (self.burst - count - 1) / previous - elapsed
+        else:
+            # Wait for the next window, where this window's count becomes the previous one
+            wait = 1 - elapsed + (max(1 - (self.burst - 1) / count, 0) if count else 0)
+        return max(wait, 0.0) * self.window_seconds
+    
+    async def hit(self, key: str) -> Optional[float]:
+        """Count a request for ``key``; return None if allowed, else the seconds to wait before retrying."""
+        if self.window_seconds <= 0:
+            return None
+        position = time.time() / self.window_seconds
+        window = int(position)
+        elapsed = position - window
+        current_key = f"ratelimit:{self.name}:{key}:{window}"
+        try:
+            count, previous = await asyncio.gather(
+                self.backend.incr(current_key, 1, self.window_seconds * 2),
+                self.backend.get(f"ratelimit:{self.name}:{key}:{window - 1}")
+            )
+        except CacheError as e:
+            # Fail open: an unavailable cache should not take chat down with it
+            logger.warning(f"Rate limit check for {self.name} failed: {e}")
+            return None
+        previous = int(previous or 0)
+        if previous * (1 - elapsed) + count <= self.burst:
+            return None
+
+        # Rejected requests do not use up the bucket
+        try:
+            await self.backend.incr(current_key, -1)
+        except CacheError:
+            pass
+        return self.retry_after(count - 1, previous, elapsed)
+
+class AdmissionController:
+    """Caps the bot generations in flight in this worker, so overload is shed instead of queued."""
+    
+    def __init__(self, max_in_flight: int, retry_after_seconds: int):
+        self.max_in_flight = max_in_flight
+        self.retry_after_seconds = retry_after_seconds
+        self.in_flight = 0
+    
+    def try_acquire(self) -> Optional[Callable[[], None]]:
+        """Take a slot, returning a function that gives it back, or None when all slots are taken."""
+        if self.max_in_flight > 0 and self.in_flight >= self.max_in_flight:
+            return None
+        self.in_flight += 1
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self.in_flight -= 1
+
+        return release
+
+def retry_after_header(seconds: float) -> str:
+    """Format a Retry-After value in whole seconds, never less than one."""
+    return str(max(math.ceil(seconds), 1))
+
+# Per-user limit on chat messages, shared across workers through the cache backend
+chat_rate_limiter = RateLimiter(
+    cache_backend,
+    "chat",
+    settings.chat_rate_limit_per_minute / 60,
+    settings.chat_rate_limit_burst
+)
+
+# Per-worker cap on concurrent bot generations
+admission_controller = AdmissionController(
+    settings.max_inflight_generations,
+    settings.admission_retry_after_seconds
+)
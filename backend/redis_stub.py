@@ -0,0 +1,117 @@
+"""Local stand-in for Redis, covering the commands the cache backend uses.
+
+Run with ``python redis_stub.py --port 6380`` and set
+``CACHE_BACKEND=redis`` and ``REDIS_URL=redis://localhost:6380/0``.
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from cache_backend import ReplyError, encode_command, read_reply
+
+class RedisStub:
+    """Single-database, in-memory server speaking enough RESP for the cache backend."""
+    
+    def __init__(self):
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+    
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        return value
+    
+    def _encode(self, reply) -> bytes:
+        """Encode a reply: str as status, int as integer, bytes or None as bulk, list as array."""
+        if isinstance(reply, ReplyError):
+            return b"-%s\r\n" % str(reply).encode()
+        if isinstance(reply, str):
+            return b"+%s\r\n" % reply.encode()
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, list):
+            return b"*%d\r\n" % len(reply) + b"".join(self._encode(item) for item in reply)
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    
+    def execute(self, args: List[bytes], writer: asyncio.StreamWriter):
+        """Run one command and return its reply."""
+        command = args[0].upper()
+        if command in (b"PING", b"AUTH", b"SELECT"):
+            return "PONG" if command == b"PING" else "OK"
+        if command == b"GET":
+            return self._get(args[1])
+        if command == b"SET":
+            key, value, options = args[1], args[2], [arg.upper() for arg in args[3:]]
+            if b"NX" in options and self._get(key) is not None:
+                return None
+            expires_at = None
+            if b"PX" in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b"PX") + 1]) / 1000
+            elif b"EX" in options:
+                expires_at = time.monotonic() + int(args[3 + options.index(b"EX") + 1])
+            self._data[key] = (value, expires_at)
+            return "OK"
+        if command == b"DEL":
+            return sum(self._data.pop(key, None) is not None for key in args[1:])
+        if command in (b"INCR", b"INCRBY"):
+            current = self._get(args[1])
+            value = int(current or 0) + (int(args[2]) if command == b"INCRBY" else 1)
+            expires_at = self._data[args[1]][1] if current is not None else None
+            self._data[args[1]] = (str(value).encode(), expires_at)
+            return value
+        if command == b"PTTL":
+            if self._get(args[1]) is None:
+                return -2
+            expires_at = self._data[args[1]][1]
+            return -1 if expires_at is None else int((expires_at - time.monotonic()) * 1000)
+        if command == b"PUBLISH":
+            subscribers = self._channels.get(args[1], set())
+            for subscriber in subscribers:
+                subscriber.write(encode_command("message", args[1], args[2]))
+            return len(subscribers)
+        if command == b"SUBSCRIBE":
+            replies = []
+            for channel in args[1:]:
+                self._channels.setdefault(channel, set()).add(writer)
+                replies.append([b"subscribe", channel, len(self._channels[channel])])
+            return replies
+        return ReplyError(f"ERR unknown command '{command.decode()}'")
+    
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one client connection until it closes."""
+        try:
+            while True:
+                args = await read_reply(reader)
+                reply = self.execute(args, writer)
+                # SUBSCRIBE confirms each channel with its own reply
+                if args[0].upper() == b"SUBSCRIBE":
+                    writer.write(b"".join(self._encode(item) for item in reply))
+                else:
+                    writer.write(self._encode(reply))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for subscribers in self._channels.values():
+                subscribers.discard(writer)
+            writer.close()
+
+async def serve(host: str, port: int):
+    """Listen until interrupted."""
+    server = await asyncio.start_server(RedisStub().handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
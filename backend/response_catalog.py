@@ -0,0 +1,61 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import ResponseCatalogEntry
+
+logger = logging.getLogger(__name__)
+
+class ResponseCatalog:
+    """Maps the chatbot's canned responses to their rows in the versioned response catalog."""
+    
+    def __init__(self):
+        self.version: Optional[int] = None
+        self._refs: Dict[str, int] = {}
+    
+    async def _load(self, db: AsyncSession, wanted: Dict[Tuple[str, int], str]) -> bool:
+        """Adopt the stored version whose entries equal ``wanted``, if there is one."""
+        versions: Dict[int, List[ResponseCatalogEntry]] = {}
+        for entry in await db.scalars(select(ResponseCatalogEntry)):
+            versions.setdefault(entry.version, []).append(entry)
+        for version, entries in versions.items():
+            if {(entry.category, entry.position): entry.text for entry in entries} == wanted:
+                self.version = version
+                self._refs = {entry.text: entry.id for entry in entries}
+                return True
+        return False
+    
+    async def sync(self, db: AsyncSession, responses: Dict[str, List[str]]):
+        """Find the catalog version matching ``responses``, creating it if the responses changed."""
+        wanted = {
+            (category, position): text
+            for category, texts in responses.items()
+            for position, text in enumerate(texts)
+        }
+        if await self._load(db, wanted):
+            return
+
+        version = (await db.scalar(select(func.max(ResponseCatalogEntry.version))) or 0) + 1
+        db.add_all([
+            ResponseCatalogEntry(version=version, category=category, position=position, text=text)
+            for (category, position), text in wanted.items()
+        ])
+        try:
+            await db.commit()
+            logger.info(f"Created response catalog version {version}")
+        except IntegrityError:
+            # Another worker created the version first; use theirs
+            await db.rollback()
+        if not await self._load(db, wanted):
+            logger.warning("Response catalog unavailable; responses will be stored inline")
+    
+    def split(self, response_text: Optional[str]) -> Tuple[Optional[int], Optional[str]]:
+        """Return (catalog reference, inline text) for storing a response."""
+        ref_id = self._refs.get(response_text) if response_text is not None else None
+        if ref_id is not None:
+            return ref_id, None
+        return None, response_text
+
+# Global response catalog, synced with the chatbot's responses at startup
+response_catalog = ResponseCatalog()
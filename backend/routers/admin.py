@@ -1,75 +1,198 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Dict, Any
+import asyncio
+import csv
+import io
+import json
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, select
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from database import get_db
-from schemas import UserResponse, MessageResponse
-from crud import get_users, get_all_messages
-from auth import get_current_admin_user
-from models import User, Message, Session as ChatSession
+from database import get_db, get_read_db, ReadSessionLocal
+from schemas import UserResponse, MessageResponse, MessageSearchResult
+from crud import (
+    get_users, get_all_messages, get_user, get_user_messages, next_cursor,
+    stream_messages_export, EXPORT_COLUMNS, STATS_CACHE_KEY, STATS_VERSION_KEY, invalidate_stats,
+    delete_message as delete_message_record
+)
+from auth import get_current_admin_user, invalidate_user_principals
+from cache import stats_cache
+from cache_backend import cache_backend
+from hashing import hashing_executor
+from search import UnsupportedSearchError, search_messages
+from chatbot import chatbot
+from models import User, Message, Session as ChatSession, DailyMessageCount
+from config import settings
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all users (admin only)."""
-    users = get_users(db, skip=skip, limit=limit)
+    try:
+        users = await get_users(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    
+    cursor_value = next_cursor(users, limit)
+    if cursor_value:
+        response.headers["X-Next-Cursor"] = cursor_value
     return users
 
 @router.get("/messages", response_model=List[MessageResponse])
 async def get_all_user_messages(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all messages from all users (admin only)."""
-    messages = get_all_messages(db, skip=skip, limit=limit)
+    try:
+        messages = await get_all_messages(db, skip=skip, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    
+    cursor_value = next_cursor(messages, limit)
+    if cursor_value:
+        response.headers["X-Next-Cursor"] = cursor_value
     return messages
 
+@router.get("/messages/search", response_model=List[MessageSearchResult])
+async def search_all_messages(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    user_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_admin: User = Depends(get_current_admin_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Search all messages, optionally for one user, best matches first (admin only)."""
+    try:
+        results, cursor_value = await search_messages(db, q, user_id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    except UnsupportedSearchError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    
+    if cursor_value:
+        response.headers["X-Next-Cursor"] = cursor_value
+    return [
+        MessageSearchResult(**MessageResponse.model_validate(message).model_dump(), score=score)
+        for message, score in results
+    ]
+
+def export_value(value: Any) -> Any:
+    """Convert a database value into its export representation."""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+@router.get("/messages/export")
+async def export_messages(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: Optional[int] = None,
+    session_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_admin: User = Depends(get_current_admin_user)
+):
+    """Stream messages as NDJSON or CSV with constant memory (admin only)."""
+    
+    async def export_rows():
+        # Use a dedicated session that stays open for the whole streamed body
+        async with ReadSessionLocal() as db:
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(EXPORT_COLUMNS)
+                yield buffer.getvalue()
+            async for rows in stream_messages_export(db, user_id, session_id, start, end):
+                if format == "csv":
+                    buffer.seek(0)
+                    buffer.truncate()
+                    writer.writerows([export_value(value) for value in row] for row in rows)
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(
+                        json.dumps({column: export_value(value) for column, value in zip(EXPORT_COLUMNS, row)}) + "\n"
+                        for row in rows
+                    )
+    
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        export_rows(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=messages.{format}"}
+    )
+
 @router.get("/stats")
 async def get_dashboard_stats(
     current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ) -> Dict[str, Any]:
     """Get dashboard statistics (admin only)."""
+    return await stats_cache.get(lambda: shared_dashboard_stats(db))
+
+async def shared_dashboard_stats(db: AsyncSession) -> Dict[str, Any]:
+    """Use statistics computed by any worker, computing and sharing them when missing or stale."""
+    version, snapshot = await asyncio.gather(
+        cache_backend.get_json(STATS_VERSION_KEY),
+        cache_backend.get_json(STATS_CACHE_KEY)
+    )
+    if snapshot is not None and snapshot["version"] == version:
+        return snapshot["stats"]
+    # A write during the computation bumps the version, leaving this snapshot stale
+    stats = await compute_dashboard_stats(db)
+    await cache_backend.set_json(
+        STATS_CACHE_KEY, {"version": version, "stats": stats}, settings.stats_cache_ttl_seconds
+    )
+    return stats
+
+async def compute_dashboard_stats(db: AsyncSession) -> Dict[str, Any]:
+    """Compute dashboard statistics from the database."""
     
-    # Total counts
-    total_users = db.query(func.count(User.id)).scalar()
-    total_messages = db.query(func.count(Message.id)).scalar()
-    total_sessions = db.query(func.count(ChatSession.id)).scalar()
-    active_sessions = db.query(func.count(ChatSession.id)).filter(ChatSession.is_active == True).scalar()
-    
-    # Recent activity (last 7 days)
+    # Total counts in a single round trip
     week_ago = datetime.utcnow() - timedelta(days=7)
-    new_users_week = db.query(func.count(User.id)).filter(User.created_at >= week_ago).scalar()
-    messages_week = db.query(func.count(Message.id)).filter(Message.created_at >= week_ago).scalar()
+    totals = (await db.execute(select(
+        select(func.count(User.id)).scalar_subquery().label("total_users"),
+        select(func.coalesce(func.sum(DailyMessageCount.message_count), 0)).scalar_subquery().label("total_messages"),
+        select(func.count(ChatSession.id)).scalar_subquery().label("total_sessions"),
+        select(func.count(ChatSession.id)).filter(ChatSession.is_active == True).scalar_subquery().label("active_sessions"),
+        select(func.count(User.id)).filter(User.created_at >= week_ago).scalar_subquery().label("new_users_week")
+    ))).one()
     
-    # Daily message counts for the last 7 days
+    # Daily message counts for the last 7 days, read from the rollup table
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=6)
+    day_counts = {
+        row.day: row.message_count
+        for row in await db.execute(select(
+            DailyMessageCount.day,
+            func.sum(DailyMessageCount.message_count).label("message_count")
+        ).filter(DailyMessageCount.day >= first_day).group_by(DailyMessageCount.day))
+    }
     daily_messages = []
     for i in range(7):
-        day_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=i)
-        day_end = day_start + timedelta(days=1)
-        count = db.query(func.count(Message.id)).filter(
-            Message.created_at >= day_start,
-            Message.created_at < day_end
-        ).scalar()
+        day = today - timedelta(days=i)
         daily_messages.append({
-            "date": day_start.strftime("%Y-%m-%d"),
-            "count": count
+            "date": day.strftime("%Y-%m-%d"),
+            "count": day_counts.get(day, 0)
         })
+    messages_week = sum(day["count"] for day in daily_messages)
     
     # Top active users (by message count)
-    top_users = db.query(
+    top_users = (await db.execute(select(
         User.username,
-        func.count(Message.id).label('message_count')
-    ).join(Message).group_by(User.id).order_by(desc('message_count')).limit(5).all()
+        func.sum(DailyMessageCount.message_count).label('message_count')
+    ).join(DailyMessageCount).group_by(User.id, User.username).order_by(desc('message_count')).limit(5))).all()
     
     top_users_list = [
         {"username": user.username, "message_count": user.message_count}
@@ -77,26 +200,39 @@ async def get_dashboard_stats(
     ]
     
     return {
-        "total_users": total_users,
-        "total_messages": total_messages,
-        "total_sessions": total_sessions,
-        "active_sessions": active_sessions,
-        "new_users_this_week": new_users_week,
+        "total_users": totals.total_users,
+        "total_messages": totals.total_messages,
+        "total_sessions": totals.total_sessions,
+        "active_sessions": totals.active_sessions,
+        "new_users_this_week": totals.new_users_week,
         "messages_this_week": messages_week,
         "daily_messages": daily_messages,
         "top_users": top_users_list,
         "generated_at": datetime.utcnow().isoformat()
     }
 
+@router.get("/metrics/hashing")
+async def get_hashing_metrics(
+    current_admin: User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """Get password hashing queue depth and latency (admin only)."""
+    return hashing_executor.metrics()
+
+@router.get("/metrics/chatbot")
+async def get_chatbot_metrics(
+    current_admin: User = Depends(get_current_admin_user)
+) -> Dict[str, Any]:
+    """Get request coalescing counters for the chatbot (admin only)."""
+    return chatbot.flight.metrics()
+
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user_details(
     user_id: int,
     current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get detailed information about a specific user (admin only)."""
-    from dump.crud import get_user
-    user = get_user(db, user_id)
+    user = await get_user(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -107,35 +243,40 @@ async def get_user_details(
 @router.get("/users/{user_id}/messages", response_model=List[MessageResponse])
 async def get_user_messages_admin(
     user_id: int,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
     current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get all messages for a specific user (admin only)."""
-    from dump.crud import get_user, get_user_messages
-    
     # Verify user exists
-    user = get_user(db, user_id)
+    user = await get_user(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    messages = get_user_messages(db, user_id, skip=skip, limit=limit)
+    try:
+        messages = await get_user_messages(db, user_id, skip=skip, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    
+    cursor_value = next_cursor(messages, limit)
+    if cursor_value:
+        response.headers["X-Next-Cursor"] = cursor_value
     return messages
 
 @router.put("/users/{user_id}/toggle-active")
 async def toggle_user_active_status(
     user_id: int,
     current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Toggle user active status (admin only)."""
-    from dump.crud import get_user
-    
-    user = get_user(db, user_id)
+    user = await get_user(db, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -150,8 +291,10 @@ async def toggle_user_active_status(
         )
     
     user.is_active = not user.is_active
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    invalidate_stats()
+    await invalidate_user_principals(user.id, user.username)
+    await db.refresh(user)
     
     status_text = "activated" if user.is_active else "deactivated"
     return {"message": f"User {user.username} has been {status_text}"}
@@ -160,16 +303,15 @@ async def toggle_user_active_status(
 async def delete_message(
     message_id: int,
     current_admin: User = Depends(get_current_admin_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a message (admin only)."""
-    message = db.query(Message).filter(Message.id == message_id).first()
+    message = await db.scalar(select(Message).filter(Message.id == message_id))
     if not message:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Message not found"
         )
     
-    db.delete(message)
-    db.commit()
+    await delete_message_record(db, message)
     return {"message": "Message deleted successfully"}
@@ -1,58 +1,100 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-from schemas import ChatRequest, ChatResponse, MessageResponse, SessionCreate, SessionResponse
+import json
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Callable, List, Optional, Union
+from database import get_db, get_read_db, SessionLocal
+from schemas import (
+    ChatRequest, ChatResponse, MessageCreate, MessageResponse, MessageSearchResult,
+    SessionCreate, SessionResponse, SessionSummaryResponse
+)
 from crud import (
-    create_message, create_chat_session, get_user_sessions, 
-    get_session, get_session_messages, end_session
+    create_chat_session, get_user_sessions,
+    get_session, get_session_messages, end_session, get_user_messages,
+    get_messages_for_sessions, get_session_summaries, get_session_history, next_cursor
 )
-from auth import get_current_active_user
+from auth import get_current_active_user, get_rate_limited_user
 from chatbot import chatbot
+from message_writer import save_message
+from search import UnsupportedSearchError, search_messages
 from models import User
+from metrics import REQUESTS_SHED
+from rate_limit import admission_controller, retry_after_header
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-@router.post("/send", response_model=ChatResponse)
-async def send_message(
-    chat_request: ChatRequest,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
-):
-    """Send a message to the chatbot and get a response."""
-    
+# Length of the last-message preview in session summaries
+PREVIEW_LENGTH = 100
+
+async def resolve_session_id(db: AsyncSession, chat_request: ChatRequest, current_user: User) -> int:
+    """Return the session for a chat request, creating one if none was given."""
     # If no session_id provided, create a new session
     session_id = chat_request.session_id
     if not session_id:
-        new_session = create_chat_session(
+        new_session = await create_chat_session(
             db, 
             current_user.id, 
             SessionCreate(title=f"Chat - {chat_request.message[:30]}...")
         )
-        session_id = new_session.id
-    else:
-        # Verify session belongs to current user
-        session = get_session(db, session_id, current_user.id)
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Session not found"
-            )
-    
-    # Generate bot response
-    user_context = {
-        "username": current_user.username,
-        "user_id": current_user.id
-    }
-    bot_response = await chatbot.generate_response(chat_request.message, user_context)
+        return new_session.id
     
-    # Save message and response to database
-    message = create_message(
-        db,
-        current_user.id,
-        MessageCreate(message_text=chat_request.message, session_id=session_id),
-        response_text=bot_response
-    )
+    # Verify session belongs to current user
+    session = await get_session(db, session_id, current_user.id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    return session_id
+
+def admit_generation() -> Callable[[], None]:
+    """Take a bot generation slot, shedding the request with 503 when the worker is saturated."""
+    release = admission_controller.try_acquire()
+    if release is None:
+        REQUESTS_SHED.labels("overloaded").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Chatbot is busy, try again shortly",
+            headers={"Retry-After": retry_after_header(admission_controller.retry_after_seconds)}
+        )
+    return release
+
+def format_sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/send", response_model=ChatResponse)
+async def send_message(
+    chat_request: ChatRequest,
+    current_user: User = Depends(get_rate_limited_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Send a message to the chatbot and get a response."""
+    release = admit_generation()
+    try:
+        session_id = await resolve_session_id(db, chat_request, current_user)
+        history = await get_session_history(db, session_id, current_user.id)
+        # Hand the connection back to the pool while the response is generated
+        await db.close()
+        
+        # Generate bot response
+        user_context = {
+            "username": current_user.username,
+            "user_id": current_user.id
+        }
+        bot_response = await chatbot.generate_response(chat_request.message, user_context, history)
+        
+        # Save message and response to database
+        message = await save_message(
+            db,
+            current_user.id,
+            MessageCreate(message_text=chat_request.message, session_id=session_id),
+            response_text=bot_response
+        )
+    finally:
+        release()
     
     return ChatResponse(
         message_id=message.id,
@@ -62,58 +104,148 @@ async def send_message(
         timestamp=message.created_at
     )
 
-@router.get("/sessions", response_model=List[SessionResponse])
+@router.post("/stream")
+async def stream_message(
+    chat_request: ChatRequest,
+    current_user: User = Depends(get_rate_limited_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Send a message to the chatbot and stream the response as Server-Sent Events.
+    
+    Emits a ``session`` event, one ``delta`` event per response chunk and a
+    final ``done`` event carrying the stored message as a ChatResponse.
+    """
+    release = admit_generation()
+    try:
+        session_id = await resolve_session_id(db, chat_request, current_user)
+        history = await get_session_history(db, session_id, current_user.id)
+    except BaseException:
+        release()
+        raise
+    # The request connection is not needed while the body streams
+    await db.close()
+    user_context = {
+        "username": current_user.username,
+        "user_id": current_user.id
+    }
+    
+    async def event_stream():
+        try:
+            yield format_sse("session", {"session_id": session_id})
+            
+            chunks = []
+            async for chunk in chatbot.stream_response(chat_request.message, user_context, history):
+                chunks.append(chunk)
+                yield format_sse("delta", {"text": chunk})
+            
+            # Persist once the full response is known; the request session may
+            # already be closed while the body is streaming
+            async with SessionLocal() as stream_db:
+                message = await save_message(
+                    stream_db,
+                    current_user.id,
+                    MessageCreate(message_text=chat_request.message, session_id=session_id),
+                    response_text="".join(chunks)
+                )
+        finally:
+            release()
+        
+        response = ChatResponse(
+            message_id=message.id,
+            user_message=message.message_text,
+            bot_response=message.response_text,
+            session_id=session_id,
+            timestamp=message.created_at
+        )
+        yield format_sse("done", response.model_dump(mode="json"))
+    
+    # The background task frees the slot if the client leaves before the body starts
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release)
+    )
+
+@router.get("/sessions", response_model=Union[List[SessionSummaryResponse], List[SessionResponse]])
 async def get_chat_sessions(
     skip: int = 0,
     limit: int = 50,
+    summary: bool = False,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get all chat sessions for the current user."""
-    sessions = get_user_sessions(db, current_user.id, skip, limit)
+    """Get all chat sessions for the current user.
+    
+    With ``summary=true`` only the message count and a preview of the last
+    message are returned per session instead of the full message list.
+    """
+    sessions = await get_user_sessions(db, current_user.id, skip, limit)
+    session_ids = [session.id for session in sessions]
+    
+    if summary:
+        summaries = await get_session_summaries(db, session_ids, current_user.id)
+        results = []
+        for session in sessions:
+            last_message = summaries[session.id]["last_message"]
+            results.append(SessionSummaryResponse(
+                id=session.id,
+                user_id=session.user_id,
+                title=session.title,
+                started_at=session.started_at,
+                ended_at=session.ended_at,
+                is_active=session.is_active,
+                message_count=summaries[session.id]["message_count"],
+                last_message_preview=last_message.message_text[:PREVIEW_LENGTH] if last_message else None,
+                last_message_at=last_message.created_at if last_message else None
+            ))
+        return results
     
-    # Load messages for each session
+    # Load messages for all sessions in a single query
+    messages = await get_messages_for_sessions(db, session_ids, current_user.id)
+    results = []
     for session in sessions:
-        session.messages = get_session_messages(db, session.id, current_user.id)
+        set_committed_value(session, "messages", messages[session.id])
+        results.append(SessionResponse.model_validate(session))
     
-    return sessions
+    return results
 
 @router.get("/sessions/{session_id}", response_model=SessionResponse)
 async def get_chat_session(
     session_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get a specific chat session with all messages."""
-    session = get_session(db, session_id, current_user.id)
+    session = await get_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    session.messages = get_session_messages(db, session_id, current_user.id)
+    set_committed_value(session, "messages", await get_session_messages(db, session_id, current_user.id))
     return session
 
 @router.post("/sessions", response_model=SessionResponse)
 async def create_new_session(
     session_data: SessionCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new chat session."""
-    session = create_chat_session(db, current_user.id, session_data)
-    session.messages = []
+    session = await create_chat_session(db, current_user.id, session_data)
+    set_committed_value(session, "messages", [])
     return session
 
 @router.put("/sessions/{session_id}/end")
 async def end_chat_session(
     session_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """End a chat session."""
-    session = end_session(db, session_id, current_user.id)
+    session = await end_session(db, session_id, current_user.id)
     if not session:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -124,12 +256,48 @@ async def end_chat_session(
 
 @router.get("/history", response_model=List[MessageResponse])
 async def get_chat_history(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get chat history for the current user."""
-    from dump.crud import get_user_messages
-    messages = get_user_messages(db, current_user.id, skip, limit)
+    """Get chat history for the current user.
+    
+    Pass the ``X-Next-Cursor`` response header back as ``cursor`` to fetch the
+    next page without scanning skipped rows.
+    """
+    try:
+        messages = await get_user_messages(db, current_user.id, skip, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    
+    cursor_value = next_cursor(messages, limit)
+    if cursor_value:
+        response.headers["X-Next-Cursor"] = cursor_value
     return messages
+
+@router.get("/search", response_model=List[MessageSearchResult])
+async def search_chat_history(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Search the current user's messages and bot responses, best matches first."""
+    try:
+        results, cursor_value = await search_messages(db, q, current_user.id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    except UnsupportedSearchError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+    
+    if cursor_value:
+        response.headers["X-Next-Cursor"] = cursor_value
+    return [
+        MessageSearchResult(**MessageResponse.model_validate(message).model_dump(), score=score)
+        for message, score in results
+    ]
@@ -0,0 +1,45 @@
+import asyncio
+import os
+from typing import Set
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from config import settings
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class SchemaVersionError(RuntimeError):
+    """Raised when the database is not at the latest migration."""
+
+def alembic_config() -> Config:
+    """Load alembic.ini with paths resolved relative to the backend package."""
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(BACKEND_DIR, "migrations"))
+    # Keep the application's logging configuration when migrating in-process
+    config.attributes["configure_logging"] = False
+    return config
+
+def head_revisions() -> Set[str]:
+    """Return the latest revision(s) among the migration scripts."""
+    return set(ScriptDirectory.from_config(alembic_config()).get_heads())
+
+async def current_revisions(engine) -> Set[str]:
+    """Read the revision(s) recorded in the database's alembic_version table."""
+    async with engine.connect() as conn:
+        return set(await conn.run_sync(lambda sync_conn: MigrationContext.configure(sync_conn).get_current_heads()))
+
+async def verify_schema(engine):
+    """Check that the database is migrated to head, upgrading it first when AUTO_MIGRATE is set."""
+    heads = head_revisions()
+    current = await current_revisions(engine)
+    if current == heads:
+        return
+    if settings.auto_migrate:
+        # Alembic runs synchronously over its own connection
+        await asyncio.to_thread(command.upgrade, alembic_config(), "head")
+        return
+    raise SchemaVersionError(
+        f"Database schema is at {sorted(current) or 'no version'}, expected {sorted(heads)}; "
+        "run 'alembic upgrade head' first"
+    )
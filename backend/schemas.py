@@ -48,6 +48,9 @@ class MessageResponse(MessageBase):
     class Config:
         from_attributes = True
 
+class MessageSearchResult(MessageResponse):
+    score: float
+
 # Session Schemas
 class SessionBase(BaseModel):
     title: Optional[str] = "New Chat"
@@ -66,6 +69,16 @@ class SessionResponse(SessionBase):
     class Config:
         from_attributes = True
 
+class SessionSummaryResponse(SessionBase):
+    id: int
+    user_id: int
+    started_at: datetime
+    ended_at: Optional[datetime]
+    is_active: bool
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+    last_message_at: Optional[datetime] = None
+
 # Chat Schemas
 class ChatRequest(BaseModel):
     message: str
@@ -0,0 +1,111 @@
+import base64
+import json
+import re
+from typing import List, Optional, Tuple
+from sqlalchemy import Float, and_, case, desc, func, literal, literal_column, or_, select, table, column, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy.sql.visitors import InternalTraversal
+from models import Message, ResponseCatalogEntry
+
+class UnsupportedSearchError(NotImplementedError):
+    """Raised when the database has no full-text search implementation here."""
+
+# SQLite: FTS5 external-content table created by the migrations
+messages_fts = table("messages_fts", column("rowid"), column("rank"))
+
+class MatchAgainst(ColumnElement):
+    """MySQL natural-language MATCH ... AGAINST relevance score."""
+    
+    inherit_cache = True
+    type = Float()
+    _traverse_internals = [
+        ("columns", InternalTraversal.dp_clauseelement_list),
+        ("query", InternalTraversal.dp_clauseelement),
+    ]
+    
+    def __init__(self, columns, query: str):
+        self.columns = columns
+        self.query = literal(query)
+
+@compiles(MatchAgainst, "mysql")
+def compile_match_against(element, compiler, **kw):
+    columns = ", ".join(compiler.process(col, **kw) for col in element.columns)
+    return f"MATCH ({columns}) AGAINST ({compiler.process(element.query, **kw)} IN NATURAL LANGUAGE MODE)"
+
+def encode_search_cursor(score: float, message_id: int) -> str:
+    """Encode a (score, id) position as an opaque cursor."""
+    raw = json.dumps([score, message_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a cursor produced by encode_search_cursor, raising ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        score, message_id = json.loads(raw)
+        return float(score), int(message_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+def fts5_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching any of its terms."""
+    return " OR ".join(f'"{term}"' for term in re.findall(r"\w+", text))
+
+async def search_messages(
+    db: AsyncSession,
+    query: str,
+    user_id: Optional[int] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None
+) -> Tuple[List[Tuple[Message, float]], Optional[str]]:
+    """Search message and response text, best matches first.
+    
+    Returns (message, score) pairs and the cursor for the next page.
+    """
+    def owned(stmt):
+        return stmt.filter(Message.user_id == user_id) if user_id is not None else stmt
+    
+    dialect = db.bind.dialect.name
+    if dialect == "mysql":
+        # Each branch is driven by one index: FULLTEXT for message text, the
+        # response_ref_id index for catalog responses, which are indexed once
+        # in the catalog rather than in every message
+        text_score = MatchAgainst([Message.message_text, Message.stored_response_text], query)
+        branches = [owned(select(Message.id, text_score.label("score")).filter(text_score > 0))]
+        catalog_score = MatchAgainst([ResponseCatalogEntry.text], query)
+        catalog_scores = dict((await db.execute(
+            select(ResponseCatalogEntry.id, catalog_score).filter(catalog_score > 0)
+        )).all())
+        if catalog_scores:
+            branches.append(owned(select(
+                Message.id, case(catalog_scores, value=Message.response_ref_id, else_=0.0).label("score")
+            ).filter(Message.response_ref_id.in_(list(catalog_scores)))))
+        matches = union_all(*branches).subquery()
+        # A message matching in both branches scores the sum of the two
+        scored = select(matches.c.id, func.sum(matches.c.score).label("score")).group_by(matches.c.id).subquery()
+        score = scored.c.score
+        stmt = select(Message, score.label("score")).join(scored, scored.c.id == Message.id)
+    elif dialect == "sqlite":
+        terms = fts5_query(query)
+        if not terms:
+            return [], None
+        # bm25 rank is lower for better matches; negate it so higher is better
+        score = -messages_fts.c.rank
+        stmt = owned(select(Message, score.label("score")).join(
+            messages_fts, messages_fts.c.rowid == Message.id
+        ).filter(literal_column("messages_fts").op("MATCH")(terms)))
+    else:
+        raise UnsupportedSearchError(f"Full-text search is not supported on {dialect}")
+    
+    if cursor:
+        last_score, last_id = decode_search_cursor(cursor)
+        stmt = stmt.filter(or_(score < last_score, and_(score == last_score, Message.id < last_id)))
+    
+    rows = (await db.execute(stmt.order_by(desc(score), desc(Message.id)).limit(limit))).all()
+    results = [(row[0], float(row[1])) for row in rows]
+    next_cursor = None
+    if len(results) == limit:
+        message, last_score = results[-1]
+        next_cursor = encode_search_cursor(last_score, message.id)
+    return results, next_cursor
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one shared computation."""
+    
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._calls = 0
+        self._coalesced = 0
+    
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fn`` unless a call with the same key is in flight, then share its result."""
+        self._calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._coalesced += 1
+        
+        # Shield the shared task so one caller disconnecting does not cancel it for the rest
+        return await asyncio.shield(task)
+    
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        """Forget a completed computation."""
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception retrieved in case every caller went away
+        if not task.cancelled():
+            task.exception()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Return call and coalescing counters."""
+        return {
+            "calls": self._calls,
+            "coalesced": self._coalesced,
+            "hit_rate": self._coalesced / self._calls if self._calls else 0.0,
+            "in_flight": len(self._in_flight)
+        }
@@ -0,0 +1,133 @@
+import os
+import tempfile
+
+# Point the settings at a throwaway database before any app module reads them
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/app.db"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["DEBUG"] = "false"
+os.environ["CACHE_BACKEND"] = "memory"
+os.environ["CHAT_RATE_LIMIT_PER_MINUTE"] = "0"
+os.environ["MESSAGE_WRITE_BEHIND"] = "false"
+
+import httpx
+import pytest
+from alembic import command
+from sqlalchemy import create_engine, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+import database
+from database import (
+    RoutingSession, SessionLocal, ReadSessionLocal, async_database_url, get_db, get_read_db
+)
+from cache import conversation_cache, stats_cache
+from cache_backend import cache_backend
+from auth import principal_cache
+from chatbot import chatbot
+from models import User
+from query_stats import instrument_engine
+from response_catalog import response_catalog
+from schema import alembic_config
+from main import app
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+def migrate(url: str):
+    """Upgrade a SQLite database to the latest migration."""
+    sync_engine = create_engine(url, poolclass=NullPool)
+    with sync_engine.begin() as conn:
+        config = alembic_config()
+        config.attributes["connection"] = conn
+        command.upgrade(config, "head")
+    sync_engine.dispose()
+
+def create_test_engine(path):
+    """Migrate a SQLite file and return an instrumented aiosqlite engine for it."""
+    url = f"sqlite:///{path}"
+    migrate(url)
+    created = create_async_engine(async_database_url(url), poolclass=NullPool)
+    instrument_engine(created.sync_engine)
+    return created
+
+@pytest.fixture
+async def db_engine(tmp_path, monkeypatch):
+    """Migrated aiosqlite database that every session in the app uses for one test."""
+    created = create_test_engine(tmp_path / "primary.db")
+    monkeypatch.setattr(database, "engine", created)
+    monkeypatch.setattr(database, "replica_engines", [])
+    binds = {maker: maker.kw["bind"] for maker in (SessionLocal, ReadSessionLocal)}
+    for maker in binds:
+        maker.configure(bind=created)
+    yield created
+    for maker, bind in binds.items():
+        maker.configure(bind=bind)
+    await created.dispose()
+
+@pytest.fixture
+async def db(db_engine):
+    """Session on the test database."""
+    async with SessionLocal() as session:
+        yield session
+
+@pytest.fixture
+async def client(db_engine, monkeypatch):
+    """HTTP client for the app with get_db and get_read_db overridden to use the test database."""
+    TestSession = async_sessionmaker(db_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    TestReadSession = async_sessionmaker(
+        db_engine, class_=AsyncSession, sync_session_class=RoutingSession,
+        autoflush=False, expire_on_commit=False
+    )
+    
+    async def override_get_db():
+        async with TestSession() as session:
+            yield session
+    
+    async def override_get_read_db():
+        async with TestReadSession() as session:
+            yield session
+    
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_read_db
+    
+    # Caches outlive a test; the database does not
+    principal_cache.clear()
+    conversation_cache.clear()
+    stats_cache.invalidate()
+    cache_backend.clear()
+    monkeypatch.setattr(response_catalog, "version", None)
+    monkeypatch.setattr(response_catalog, "_refs", {})
+    monkeypatch.setattr(chatbot, "delay_range", (0.0, 0.0))
+    
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http:
+        yield http
+    app.dependency_overrides.clear()
+
+async def login(client: httpx.AsyncClient, username: str, admin: bool = False) -> dict:
+    """Register a user and return authorization headers for them."""
+    response = await client.post(
+        "/auth/register", json={"username": username, "email": f"{username}@example.com", "password": "secret"}
+    )
+    assert response.status_code == 201, response.text
+    if admin:
+        async with SessionLocal() as session:
+            await session.execute(update(User).where(User.username == username).values(is_admin=True))
+            await session.commit()
+    response = await client.post("/auth/login", data={"username": username, "password": "secret"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def register(client):
+    """Return a coroutine function that registers a user and returns their authorization headers."""
+    return lambda username, admin=False: login(client, username, admin)
+
+@pytest.fixture
+async def user_headers(client):
+    """Authorization headers for a regular user."""
+    return await login(client, "alice")
+
+@pytest.fixture
+async def admin_headers(client):
+    """Authorization headers for an admin user."""
+    return await login(client, "admin", admin=True)
@@ -0,0 +1,16 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def test_deactivation_applies_despite_the_principal_cache(client, user_headers, admin_headers):
+    me = await client.get("/auth/me", headers=user_headers)
+    assert me.status_code == 200
+    assert (await client.post("/chat/send", json={"message": "hi"}, headers=user_headers)).status_code == 200
+    
+    response = await client.put(f"/admin/users/{me.json()['id']}/toggle-active", headers=admin_headers)
+    assert response.status_code == 200
+    assert (await client.get("/auth/me", headers=user_headers)).status_code == 400
+    assert (await client.post("/chat/send", json={"message": "hi"}, headers=user_headers)).status_code == 400
+    
+    await client.put(f"/admin/users/{me.json()['id']}/toggle-active", headers=admin_headers)
+    assert (await client.get("/auth/me", headers=user_headers)).status_code == 200
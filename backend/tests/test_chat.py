@@ -0,0 +1,47 @@
+import json
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def test_register_and_me(client, user_headers):
+    response = await client.get("/auth/me", headers=user_headers)
+    assert response.status_code == 200
+    assert response.json()["username"] == "alice"
+
+async def test_send_creates_session_and_history(client, user_headers):
+    response = await client.post("/chat/send", json={"message": "hello there"}, headers=user_headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["user_message"] == "hello there"
+    assert body["bot_response"]
+    
+    response = await client.post(
+        "/chat/send", json={"message": "tell me about money", "session_id": body["session_id"]}, headers=user_headers
+    )
+    assert response.status_code == 200
+    
+    response = await client.get(f"/chat/sessions/{body['session_id']}", headers=user_headers)
+    assert [message["message_text"] for message in response.json()["messages"]] == ["hello there", "tell me about money"]
+    
+    response = await client.get("/chat/history", headers=user_headers)
+    assert len(response.json()) == 2
+
+async def test_sessions_are_private(client, user_headers, register):
+    response = await client.post("/chat/send", json={"message": "hi"}, headers=user_headers)
+    session_id = response.json()["session_id"]
+    
+    other = await register("bob")
+    response = await client.get(f"/chat/sessions/{session_id}", headers=other)
+    assert response.status_code == 404
+    response = await client.post("/chat/send", json={"message": "hi", "session_id": session_id}, headers=other)
+    assert response.status_code == 404
+
+async def test_stream_persists_message(client, user_headers):
+    response = await client.post("/chat/stream", json={"message": "help me"}, headers=user_headers)
+    assert response.status_code == 200
+    events = [block for block in response.text.split("\n\n") if block]
+    assert events[0].startswith("event: session")
+    done = json.loads(events[-1].split("data: ", 1)[1])
+    
+    response = await client.get("/chat/history", headers=user_headers)
+    assert [message["id"] for message in response.json()] == [done["message_id"]]
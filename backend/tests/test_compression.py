@@ -0,0 +1,49 @@
+import logging
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, select, text
+from compression import COMPRESSED_PREFIX, CompressedText, warn_if_compressing
+
+LONG_TEXT = "the budget and the savings plan " * 20
+
+def make_table():
+    """In-memory SQLite table with a compressed column at a 100-character threshold."""
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    notes = Table("notes", metadata, Column("id", Integer, primary_key=True), Column("body", CompressedText(100)))
+    metadata.create_all(engine)
+    return engine, notes
+
+def stored(conn, row_id: int) -> str:
+    return conn.execute(text("SELECT body FROM notes WHERE id = :id"), {"id": row_id}).scalar()
+
+def test_long_values_round_trip_compressed():
+    engine, notes = make_table()
+    with engine.begin() as conn:
+        conn.execute(insert(notes), [{"id": 1, "body": LONG_TEXT}, {"id": 2, "body": "short"}])
+        assert stored(conn, 1).startswith(COMPRESSED_PREFIX)
+        assert len(stored(conn, 1)) < len(LONG_TEXT)
+        assert stored(conn, 2) == "short"
+        assert conn.execute(select(notes.c.body).order_by(notes.c.id)).scalars().all() == [LONG_TEXT, "short"]
+
+def test_legacy_uncompressed_rows_read_back_as_is():
+    engine, notes = make_table()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO notes (id, body) VALUES (1, :body)"), {"body": LONG_TEXT})
+        assert conn.execute(select(notes.c.body)).scalar() == LONG_TEXT
+
+def test_values_starting_with_the_prefix_survive():
+    engine, notes = make_table()
+    tricky = COMPRESSED_PREFIX + "not base64 at all"
+    with engine.begin() as conn:
+        conn.execute(insert(notes), [{"id": 1, "body": tricky}])
+        assert conn.execute(select(notes.c.body)).scalar() == tricky
+
+def test_threshold_zero_stores_plain_text():
+    column = CompressedText(0)
+    assert column.process_bind_param(LONG_TEXT, None) == LONG_TEXT
+
+def test_enabling_compression_warns_about_search(caplog):
+    with caplog.at_level(logging.WARNING, logger="compression"):
+        warn_if_compressing(0)
+        assert caplog.records == []
+        warn_if_compressing(1024)
+    assert "full-text search" in caplog.text
@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+from datetime import datetime
+import pytest
+import crud
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def messages(client, user_headers, register, monkeypatch):
+    """Alice's two sessions, on 1 and 2 March, and one message from Bob."""
+    bob_headers = await register("bob")
+    monkeypatch.setattr(crud, "message_timestamp", lambda: datetime(2026, 3, 1, 12, 0, 0))
+    first = await client.post("/chat/send", json={"message": "one"}, headers=user_headers)
+    session_id = first.json()["session_id"]
+    await client.post("/chat/send", json={"message": "two", "session_id": session_id}, headers=user_headers)
+    monkeypatch.setattr(crud, "message_timestamp", lambda: datetime(2026, 3, 2, 12, 0, 0))
+    await client.post("/chat/send", json={"message": "three"}, headers=user_headers)
+    await client.post("/chat/send", json={"message": "bob's"}, headers=bob_headers)
+    me = await client.get("/auth/me", headers=user_headers)
+    return {"user_id": me.json()["id"], "session_id": session_id}
+
+async def export(client, headers, **params) -> list:
+    response = await client.get("/admin/messages/export", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    if params.get("format") == "csv":
+        return list(csv.DictReader(io.StringIO(response.text)))
+    return [json.loads(line) for line in response.text.splitlines()]
+
+async def test_ndjson_export_with_filters(client, admin_headers, messages):
+    rows = await export(client, admin_headers)
+    assert [row["message_text"] for row in rows] == ["one", "two", "three", "bob's"]
+    assert set(rows[0]) == set(crud.EXPORT_COLUMNS)
+    
+    by_user = await export(client, admin_headers, user_id=messages["user_id"])
+    assert [row["message_text"] for row in by_user] == ["one", "two", "three"]
+    by_session = await export(client, admin_headers, session_id=messages["session_id"])
+    assert [row["message_text"] for row in by_session] == ["one", "two"]
+    by_date = await export(client, admin_headers, start="2026-03-02T00:00:00", end="2026-03-03T00:00:00")
+    assert [row["message_text"] for row in by_date] == ["three", "bob's"]
+
+async def test_csv_export(client, admin_headers, messages):
+    response = await client.get("/admin/messages/export", params={"format": "csv"}, headers=admin_headers)
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = await export(client, admin_headers, format="csv", session_id=messages["session_id"])
+    assert [row["message_text"] for row in rows] == ["one", "two"]
+    assert rows[0]["created_at"].startswith("2026-03-01")
+
+async def test_export_is_admin_only(client, user_headers):
+    response = await client.get("/admin/messages/export", headers=user_headers)
+    assert response.status_code == 403
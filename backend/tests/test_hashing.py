@@ -0,0 +1,33 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from hashing import HashingExecutor
+
+pytestmark = pytest.mark.anyio
+
+async def test_cancelled_callers_keep_their_slot_until_the_worker_finishes():
+    executor = HashingExecutor(workers=1, queue_size=0)
+    release = threading.Event()
+    try:
+        # The running call fills the pool, then its caller disconnects
+        caller = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        
+        # The bcrypt thread is still busy, so the pool must stay full
+        assert executor.metrics()["in_flight"] == 1
+        with pytest.raises(HTTPException) as rejected:
+            await executor.run(lambda: "too soon")
+        assert rejected.value.status_code == 503
+        
+        release.set()
+        for _ in range(100):
+            if executor._pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await executor.run(lambda: "ok") == "ok"
+    finally:
+        release.set()
+        executor.shutdown()
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from chatbot import chatbot
+from health import HealthProbe, health_probe
+
+pytestmark = pytest.mark.anyio
+
+class BusyPool:
+    """Stand-in for a request pool with a given number of connections checked out."""
+    
+    max_overflow = 5
+    
+    def __init__(self, checked_out: int):
+        self.checked_out = checked_out
+    
+    def checkedout(self) -> int:
+        return self.checked_out
+    
+    def size(self) -> int:
+        return 5
+
+@pytest.fixture
+async def probe(db_engine, monkeypatch):
+    """The app's health probe, pinging the test database."""
+    monkeypatch.setattr(health_probe, "_engines", {"primary": db_engine})
+    monkeypatch.setattr(health_probe, "result", health_probe.result)
+    return health_probe
+
+async def test_ready_when_every_check_passes(client, probe):
+    await probe.refresh()
+    response = await client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+async def test_unreachable_database_is_unavailable(client, probe, tmp_path, monkeypatch):
+    missing = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/app.db", poolclass=NullPool)
+    monkeypatch.setattr(probe, "_engines", {"primary": missing})
+    await probe.refresh()
+    
+    response = await client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["databases"]["primary"]["status"] == "unavailable"
+    await missing.dispose()
+
+async def test_failing_completion_backend_only_degrades(client, probe, monkeypatch):
+    monkeypatch.setattr(chatbot, "status", lambda: {"backend": "http", "status": "failing"})
+    await probe.refresh()
+    
+    response = await client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
+
+def test_pool_saturation():
+    probe = HealthProbe(interval_seconds=5, timeout_seconds=1, saturation_threshold=0.9)
+    assert probe.check_pool(BusyPool(4)) == {"status": "ok", "checked_out": 4, "capacity": 10}
+    assert probe.check_pool(BusyPool(9))["status"] == "saturated"
@@ -0,0 +1,40 @@
+import pytest
+from crud import get_session_messages, get_user_messages, get_user_sessions
+from query_stats import capture_queries
+
+pytestmark = pytest.mark.anyio
+
+async def query_plan(db_engine, run) -> str:
+    """Run a crud read and return SQLite's plan for the single statement it executed."""
+    with capture_queries() as stats:
+        await run()
+    [statement] = stats.statements
+    # Any value works for the placeholders; the plan depends only on the query's shape
+    params = (1,) * statement.count("?")
+    async with db_engine.connect() as conn:
+        rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params)
+        return "\n".join(row.detail for row in rows)
+
+@pytest.fixture
+async def seeded(client, user_headers, register):
+    """A few users, each with sessions of several messages."""
+    other_headers = await register("bob")
+    for headers in (user_headers, other_headers):
+        for index in range(3):
+            session_id = None
+            for turn in range(3):
+                payload = {"message": f"session {index} turn {turn}"}
+                if session_id:
+                    payload["session_id"] = session_id
+                response = await client.post("/chat/send", json=payload, headers=headers)
+                session_id = response.json()["session_id"]
+
+@pytest.mark.parametrize("name, index, run", [
+    ("get_session_messages", "idx_messages_session_user_created", lambda db: get_session_messages(db, 1, 1)),
+    ("get_user_sessions", "idx_sessions_user_started", lambda db: get_user_sessions(db, 1)),
+    ("get_user_messages", "idx_messages_user_created_id", lambda db: get_user_messages(db, 1)),
+])
+async def test_reads_use_their_index_without_sorting(seeded, db_engine, db, name, index, run):
+    plan = await query_plan(db_engine, lambda: run(db))
+    assert index in plan, f"{name} plan:\n{plan}"
+    assert "USE TEMP B-TREE" not in plan, f"{name} plan:\n{plan}"
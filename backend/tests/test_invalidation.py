@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from cache_backend import cache_backend, invalidation_bus
+from crud import STATS_CACHE_KEY
+from routers import admin
+
+pytestmark = pytest.mark.anyio
+
+async def test_chat_turn_does_not_wait_for_the_broadcast(client, user_headers, monkeypatch):
+    release = asyncio.Event()
+
+    async def slow_publish(channel, message):
+        await release.wait()
+
+    monkeypatch.setattr(cache_backend, "publish", slow_publish)
+    response = await asyncio.wait_for(
+        client.post("/chat/send", json={"message": "hello"}, headers=user_headers), timeout=5
+    )
+    assert response.status_code == 200
+    
+    release.set()
+    await invalidation_bus.drain()
+
+async def test_account_change_keeps_the_shared_snapshot_but_marks_it_stale(client, admin_headers, register):
+    before = (await client.get("/admin/stats", headers=admin_headers)).json()
+    await register("bob")
+    await invalidation_bus.drain()
+    
+    assert await cache_backend.get_json(STATS_CACHE_KEY) is not None
+    after = (await client.get("/admin/stats", headers=admin_headers)).json()
+    assert after["total_users"] == before["total_users"] + 1
+
+async def test_message_writes_do_not_shorten_the_stats_interval(client, user_headers, admin_headers, monkeypatch):
+    computed = 0
+    compute = admin.compute_dashboard_stats
+
+    async def counting_compute(db):
+        nonlocal computed
+        computed += 1
+        return await compute(db)
+
+    monkeypatch.setattr(admin, "compute_dashboard_stats", counting_compute)
+    for index in range(5):
+        await client.post("/chat/send", json={"message": f"hello {index}"}, headers=user_headers)
+        await invalidation_bus.drain()
+        await client.get("/admin/stats", headers=admin_headers)
+    assert computed == 1
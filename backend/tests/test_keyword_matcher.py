@@ -0,0 +1,34 @@
+import pytest
+from chatbot import ChatbotService, KeywordMatcher
+
+def test_keywords_match_whole_words_only():
+    matcher = KeywordMatcher({"greeting": ["hi"], "technology": ["ai"]})
+    assert matcher.match("this is what she said") == {}
+    assert matcher.match("Hi, tell me about AI") == {"greeting": 1, "technology": 1}
+
+def test_multi_word_keywords_need_every_word_in_order():
+    matcher = KeywordMatcher({"goodbye": ["see you"]})
+    assert matcher.match("see you tomorrow") == {"goodbye": 1}
+    assert matcher.match("you see") == {}
+    assert matcher.match("see, you!") == {"goodbye": 1}
+
+def test_failure_links_recover_partial_matches():
+    matcher = KeywordMatcher({"long": ["a b c"], "short": ["b d"], "inner": ["b c"]})
+    # After "a b" the next token "d" falls back to the "b" node
+    assert matcher.match("a b d") == {"short": 1}
+    # Outputs along failure links report keywords nested in longer ones
+    assert matcher.match("a b c") == {"long": 1, "inner": 1}
+
+def test_distinct_keywords_are_counted_once():
+    matcher = KeywordMatcher({"finance": ["money", "budget"]})
+    assert matcher.match("money money budget") == {"finance": 2}
+
+@pytest.mark.parametrize("message, category", [
+    ("this is what she said", "default"),
+    ("hi there", "greeting"),
+    ("tell me about artificial intelligence and software", "technology"),
+    ("what can you do", "help"),
+    ("I need a budget for my startup company", "business"),
+])
+def test_classify(message, category):
+    assert ChatbotService().classify(message) == category
@@ -0,0 +1,78 @@
+import asyncio
+import httpx
+import pytest
+import llm_stub
+from chatbot import ChatbotService
+from llm import CompletionError, HTTPCompletionBackend
+
+pytestmark = pytest.mark.anyio
+
+def backend_with(transport: httpx.AsyncBaseTransport, **kw) -> HTTPCompletionBackend:
+    """HTTP backend whose pooled client talks to ``transport`` instead of the network."""
+    backend = HTTPCompletionBackend("http://llm/complete", **kw)
+    backend._client = httpx.AsyncClient(transport=transport)
+    return backend
+
+def scripted(*statuses: int):
+    """Transport answering with each status in turn, recording how many requests it saw."""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = statuses[min(len(calls), len(statuses) - 1)]
+        calls.append(request)
+        return httpx.Response(status, json={"response": "from the model"})
+
+    return httpx.MockTransport(handler), calls
+
+async def test_completes_against_the_stub_service():
+    backend = backend_with(httpx.ASGITransport(app=llm_stub.app))
+    response = await backend.complete("hi", {"username": "alice"})
+    assert response == "Hi alice, you said: hi"
+    await backend.close()
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+async def test_transient_failures_are_retried(status):
+    transport, calls = scripted(status, 200)
+    backend = backend_with(transport, max_retries=2)
+    assert await backend.complete("hi") == "from the model"
+    assert len(calls) == 2
+    assert backend.consecutive_failures == 0
+
+async def test_client_errors_are_not_retried():
+    transport, calls = scripted(400)
+    backend = backend_with(transport, max_retries=2)
+    with pytest.raises(CompletionError):
+        await backend.complete("hi")
+    assert len(calls) == 1
+
+async def test_gives_up_after_the_last_retry():
+    transport, calls = scripted(502)
+    backend = backend_with(transport, max_retries=2)
+    with pytest.raises(CompletionError):
+        await backend.complete("hi")
+    assert len(calls) == 3
+    assert backend.consecutive_failures == 1
+
+async def test_waiting_for_a_concurrency_slot_times_out():
+    release = asyncio.Event()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await release.wait()
+        return httpx.Response(200, json={"response": "slow"})
+
+    backend = backend_with(httpx.MockTransport(handler), max_concurrency=1, timeout_seconds=0.05)
+    first = asyncio.create_task(backend.complete("first"))
+    await asyncio.sleep(0)
+    with pytest.raises(CompletionError, match="concurrency limit"):
+        await backend.complete("second")
+    assert backend.status()["in_flight"] == 1
+    release.set()
+    assert await first == "slow"
+    assert backend.status()["in_flight"] == 0
+
+async def test_chatbot_falls_back_to_keywords_when_the_backend_fails():
+    transport, _ = scripted(500)
+    service = ChatbotService(backend_with(transport, max_retries=0))
+    service.delay_range = (0.0, 0.0)
+    response = await service.generate_response("hello")
+    assert response in service.responses["greeting"]
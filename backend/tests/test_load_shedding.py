@@ -0,0 +1,39 @@
+import pytest
+import auth
+from cache_backend import cache_backend
+from rate_limit import RateLimiter, admission_controller
+
+pytestmark = pytest.mark.anyio
+
+async def send(client, headers, message: str = "hello"):
+    return await client.post("/chat/send", json={"message": message}, headers=headers)
+
+async def test_chat_is_rate_limited_per_user(client, user_headers, register, monkeypatch):
+    monkeypatch.setattr(auth, "chat_rate_limiter", RateLimiter(cache_backend, "chat", 1 / 60, 2))
+    assert (await send(client, user_headers)).status_code == 200
+    assert (await send(client, user_headers)).status_code == 200
+    
+    response = await send(client, user_headers)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # Another user has their own bucket
+    assert (await send(client, await register("bob"))).status_code == 200
+
+async def test_generations_beyond_the_cap_are_shed(client, user_headers, monkeypatch):
+    monkeypatch.setattr(admission_controller, "max_in_flight", 1)
+    release = admission_controller.try_acquire()
+    try:
+        response = await send(client, user_headers)
+        assert response.status_code == 503
+        assert int(response.headers["Retry-After"]) >= 1
+    finally:
+        release()
+    assert (await send(client, user_headers)).status_code == 200
+    assert admission_controller.in_flight == 0
+
+async def test_stream_gives_its_slot_back_when_done(client, user_headers, monkeypatch):
+    monkeypatch.setattr(admission_controller, "max_in_flight", 1)
+    response = await client.post("/chat/stream", json={"message": "help me"}, headers=user_headers)
+    assert response.status_code == 200
+    assert admission_controller.in_flight == 0
+    assert (await send(client, user_headers)).status_code == 200
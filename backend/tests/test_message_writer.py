@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from sqlalchemy import func, select
+import message_writer
+from message_writer import MessageWriter, save_message
+from config import settings
+from models import Message
+from schemas import MessageCreate
+
+pytestmark = pytest.mark.anyio
+
+async def count_messages(db) -> int:
+    return await db.scalar(select(func.count(Message.id)))
+
+async def test_stop_waits_for_a_flush_in_progress(db, register, monkeypatch):
+    await register("alice")
+    bulk = message_writer.create_messages_bulk
+    started = asyncio.Event()
+
+    async def slow_bulk(db, rows):
+        started.set()
+        await asyncio.sleep(0.2)
+        await bulk(db, rows)
+
+    monkeypatch.setattr(message_writer, "create_messages_bulk", slow_bulk)
+    writer = MessageWriter(batch_size=1, flush_interval_ms=60000, id_block_size=10, max_buffer_size=0)
+    writer.start()
+    await writer.enqueue(1, MessageCreate(message_text="hello"), "hi")
+    await started.wait()
+    await writer.stop()
+    
+    assert await count_messages(db) == 1
+    assert writer._buffer == []
+
+async def test_cancelled_flush_keeps_its_rows(db, register, monkeypatch):
+    await register("alice")
+    blocked = asyncio.Event()
+
+    async def hanging_bulk(db, rows):
+        blocked.set()
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(message_writer, "create_messages_bulk", hanging_bulk)
+    writer = MessageWriter(batch_size=100, flush_interval_ms=60000, id_block_size=10, max_buffer_size=0)
+    await writer.enqueue(1, MessageCreate(message_text="hello"), "hi")
+    flush = asyncio.create_task(writer.flush())
+    await blocked.wait()
+    flush.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush
+    
+    assert [row["message_text"] for row in writer._buffer] == ["hello"]
+
+async def test_a_row_that_fails_alone_is_set_aside(db, register, monkeypatch):
+    await register("alice")
+    bulk = message_writer.create_messages_bulk
+
+    async def picky_bulk(db, rows):
+        if any(row["message_text"] == "poison" for row in rows):
+            raise ValueError("row rejected")
+        await bulk(db, rows)
+
+    monkeypatch.setattr(message_writer, "create_messages_bulk", picky_bulk)
+    writer = MessageWriter(batch_size=100, flush_interval_ms=60000, id_block_size=10, max_buffer_size=0)
+    for text in ["one", "two", "poison", "three", "four"]:
+        await writer.enqueue(1, MessageCreate(message_text=text), "hi")
+    await writer.flush()
+    
+    assert await count_messages(db) == 4
+    assert writer._buffer == []
+    assert [row["message_text"] for row in writer.rejected] == ["poison"]
+
+async def test_full_buffer_falls_back_to_direct_writes(db, register, monkeypatch):
+    await register("alice")
+    writer = MessageWriter(batch_size=100, flush_interval_ms=60000, id_block_size=10, max_buffer_size=1)
+    monkeypatch.setattr(message_writer, "message_writer", writer)
+    monkeypatch.setattr(settings, "message_write_behind", True)
+    await save_message(db, 1, MessageCreate(message_text="buffered"), "hi")
+    assert writer.full()
+    await save_message(db, 1, MessageCreate(message_text="direct"), "hi")
+    
+    assert [row["message_text"] for row in writer._buffer] == ["buffered"]
+    assert await count_messages(db) == 1
+    
+    await writer.flush()
+    assert list(writer.rejected) == []
+    rows = (await db.execute(select(Message.id, Message.message_text).order_by(Message.id))).all()
+    assert [text for _, text in rows] == ["buffered", "direct"]
+    assert rows[0].id != rows[1].id
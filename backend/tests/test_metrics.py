@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from prometheus_client.core import REGISTRY
+from chatbot import chatbot
+
+pytestmark = pytest.mark.anyio
+
+def sample_total(name: str) -> float:
+    """Sum a sample over every label combination."""
+    return sum(
+        sample.value
+        for metric in REGISTRY.collect()
+        for sample in metric.samples
+        if sample.name == name
+    )
+
+async def test_stream_records_chatbot_latency(client, user_headers):
+    before = sample_total("chatbot_response_duration_seconds_count")
+    response = await client.post("/chat/stream", json={"message": "hello there"}, headers=user_headers)
+    assert response.status_code == 200
+    
+    assert sample_total("chatbot_response_duration_seconds_count") == before + 1
+
+async def test_coalescing_and_hashing_are_exported(client, user_headers):
+    await client.post("/chat/send", json={"message": "hello"}, headers=user_headers)
+    
+    body = (await client.get("/metrics")).text
+    assert 'coalescing_calls_total{name="chatbot"}' in body
+    assert 'coalescing_coalesced_total{name="chatbot"}' in body
+    assert "password_hash_duration_seconds_count" in body
+    assert "password_hash_queue_depth" in body
+
+async def test_concurrent_identical_messages_share_one_generation(client, register, monkeypatch):
+    monkeypatch.setattr(chatbot, "delay_range", (0.2, 0.2))
+    # Only greetings are personalized, so pin the shared response to one
+    monkeypatch.setitem(chatbot.responses, "greeting", ["Hello! How can I help you today?"])
+    names = ["ann", "ben", "cat", "dan"]
+    headers = {name: await register(name) for name in names}
+    before = chatbot.flight.metrics()
+    
+    responses = await asyncio.gather(*(
+        client.post("/chat/send", json={"message": "hello"}, headers=headers[name]) for name in names
+    ))
+    after = chatbot.flight.metrics()
+    assert after["calls"] - before["calls"] == len(names)
+    assert after["coalesced"] - before["coalesced"] == len(names) - 1
+    for name, response in zip(names, responses):
+        assert response.json()["bot_response"] == f"Hello {name}! How can I help you today?"
@@ -0,0 +1,23 @@
+from alembic import command
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.pool import NullPool
+from schema import alembic_config
+
+def upgrade(conn, revision: str):
+    config = alembic_config()
+    config.attributes["connection"] = conn
+    command.upgrade(config, revision)
+
+def test_upgrade_adopts_indexes_created_outside_migrations(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'adopted.db'}", poolclass=NullPool)
+    with engine.begin() as conn:
+        upgrade(conn, "0001")
+        # The root SQL scripts create the session query indexes themselves
+        conn.execute(text("CREATE INDEX idx_sessions_user_started ON sessions (user_id, started_at)"))
+        conn.execute(text(
+            "CREATE INDEX idx_messages_session_user_created ON messages (session_id, user_id, created_at, id)"
+        ))
+        upgrade(conn, "head")
+        indexes = {index["name"] for index in inspect(conn).get_indexes("messages")}
+    engine.dispose()
+    assert "idx_messages_session_user_created" in indexes
@@ -0,0 +1,41 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+async def collect_pages(client, url: str, headers: dict, limit: int):
+    """Follow X-Next-Cursor until the last page, returning the ids of every page."""
+    pages, params = [], {"limit": limit}
+    while True:
+        response = await client.get(url, params=params, headers=headers)
+        assert response.status_code == 200, response.text
+        pages.append([row["id"] for row in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+        params = {"limit": limit, "cursor": cursor}
+
+async def test_history_cursor_walks_every_message_once(client, user_headers):
+    # Messages sent within one second share created_at, so paging relies on the id tiebreak
+    for index in range(7):
+        await client.post("/chat/send", json={"message": f"message {index}"}, headers=user_headers)
+    everything = (await client.get("/chat/history", params={"limit": 100}, headers=user_headers)).json()
+    
+    pages = await collect_pages(client, "/chat/history", user_headers, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [row_id for page in pages for row_id in page] == [row["id"] for row in everything]
+
+async def test_admin_users_and_messages_cursor(client, admin_headers, register):
+    headers = [await register(f"user{index}") for index in range(4)]
+    for user in headers:
+        await client.post("/chat/send", json={"message": "hi"}, headers=user)
+    
+    pages = await collect_pages(client, "/admin/users", admin_headers, limit=2)
+    user_ids = [row_id for page in pages for row_id in page]
+    assert len(user_ids) == 5 and len(set(user_ids)) == 5
+    
+    pages = await collect_pages(client, "/admin/messages", admin_headers, limit=3)
+    assert [len(page) for page in pages] == [3, 1]
+
+async def test_invalid_cursor_is_rejected(client, user_headers):
+    response = await client.get("/chat/history", params={"cursor": "not-a-cursor"}, headers=user_headers)
+    assert response.status_code == 400
@@ -0,0 +1,81 @@
+import asyncio
+import socket
+import pytest
+from cache_backend import CacheError, InvalidationBus, RedisCacheBackend
+from redis_stub import RedisStub
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def stub():
+    """RedisStub listening on an ephemeral port."""
+    stub = RedisStub()
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    stub.port = server.sockets[0].getsockname()[1]
+    yield stub
+    server.close()
+
+@pytest.fixture
+async def backend(stub):
+    backend = RedisCacheBackend(f"redis://127.0.0.1:{stub.port}/0", pool_size=2, timeout_seconds=1.0)
+    yield backend
+    await backend.close()
+
+async def wait_for(condition, timeout: float = 2.0):
+    """Poll until ``condition()`` is true."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+async def test_get_and_set_with_expiry(backend):
+    await backend.set("plain", "value")
+    await backend.set("short", "value", ttl_seconds=0.05)
+    assert await backend.get("plain") == "value"
+    assert await backend.get("short") == "value"
+    assert 0 < await backend.ttl("short") <= 0.05
+    assert await backend.ttl("plain") is None
+    
+    await asyncio.sleep(0.1)
+    assert await backend.get("short") is None
+    assert await backend.get("plain") == "value"
+    await backend.delete("plain")
+    assert await backend.get("plain") is None
+
+async def test_incr_sets_expiry_only_on_creation(backend):
+    assert await backend.incr("counter", 1, ttl_seconds=10) == 1
+    first_ttl = await backend.ttl("counter")
+    assert await backend.incr("counter", 2, ttl_seconds=10) == 3
+    assert 0 < await backend.ttl("counter") <= first_ttl <= 10
+    
+    assert await backend.incr("forever") == 1
+    assert await backend.ttl("forever") is None
+
+async def test_invalidations_reach_other_workers_only(stub, backend):
+    other = RedisCacheBackend(f"redis://127.0.0.1:{stub.port}/0")
+    sender, receiver = InvalidationBus(backend), InvalidationBus(other)
+    sent, received = [], []
+    sender.register("conversation", sent.append)
+    receiver.register("conversation", received.append)
+    await sender.start()
+    await receiver.start()
+    await wait_for(lambda: len(stub._channels.get(b"cache-invalidation", ())) == 2)
+    
+    await sender.invalidate("conversation", "42")
+    await wait_for(lambda: received == ["42"])
+    # The sender applied it locally and skips its own broadcast
+    await asyncio.sleep(0.05)
+    assert sent == ["42"]
+    await other.close()
+
+async def test_unreachable_server_fails_fast():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    backend = RedisCacheBackend(f"redis://127.0.0.1:{port}/0", timeout_seconds=0.5)
+    with pytest.raises(CacheError, match="command failed"):
+        await backend.get("key")
+    # Until the retry interval passes, calls fail without trying to connect
+    with pytest.raises(CacheError, match="unavailable"):
+        await backend.get("key")
+    assert await backend.get_json("key") is None
@@ -0,0 +1,36 @@
+from datetime import date, datetime
+import pytest
+from sqlalchemy import func, select
+import crud
+from models import DailyMessageCount, Message
+from schemas import MessageCreate, UserCreate
+
+pytestmark = pytest.mark.anyio
+
+async def rollup(db, user_id: int):
+    rows = await db.execute(select(DailyMessageCount.day, DailyMessageCount.message_count).filter(
+        DailyMessageCount.user_id == user_id
+    ))
+    return dict(rows.all())
+
+async def test_rollup_day_matches_stored_created_at(db, monkeypatch):
+    user = await crud.create_user(db, UserCreate(username="carol", email="carol@example.com", password="secret"))
+    # A message a second before midnight must land on the same day it is later removed from
+    monkeypatch.setattr(crud, "message_timestamp", lambda: datetime(2026, 1, 1, 23, 59, 59))
+    message = await crud.create_message(db, user.id, MessageCreate(message_text="late night"), "reply")
+    
+    stored_day = await db.scalar(select(func.date(Message.created_at)).filter(Message.id == message.id))
+    assert str(stored_day) == "2026-01-01"
+    assert await rollup(db, user.id) == {date(2026, 1, 1): 1}
+    
+    await crud.delete_message(db, message)
+    assert await rollup(db, user.id) == {date(2026, 1, 1): 0}
+
+async def test_bulk_rows_are_counted_by_their_created_at(db):
+    user = await crud.create_user(db, UserCreate(username="dave", email="dave@example.com", password="secret"))
+    await crud.create_messages_bulk(db, [
+        {"user_id": user.id, "message_text": "a", "created_at": datetime(2026, 3, 1, 23, 59, 59)},
+        {"user_id": user.id, "message_text": "b", "created_at": datetime(2026, 3, 2, 0, 0, 0)},
+        {"user_id": user.id, "message_text": "c", "created_at": datetime(2026, 3, 2, 12, 0, 0)},
+    ])
+    assert await rollup(db, user.id) == {date(2026, 3, 1): 1, date(2026, 3, 2): 2}
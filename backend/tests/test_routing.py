@@ -0,0 +1,52 @@
+import itertools
+import pytest
+from sqlalchemy import select
+import database
+from database import ReadSessionLocal, SessionLocal, use_primary
+from models import User
+from tests.conftest import create_test_engine
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def replica(db_engine, tmp_path, monkeypatch):
+    """Second SQLite file standing in for a read replica that has not caught up."""
+    created = create_test_engine(tmp_path / "replica.db")
+    monkeypatch.setattr(database, "replica_engines", [created])
+    monkeypatch.setattr(database, "replica_cycle", itertools.cycle([created]))
+    monkeypatch.setattr(database.settings, "replica_selection", "round_robin")
+    async with SessionLocal() as db:
+        db.add(User(username="on-primary", email="primary@example.com", password_hash="x"))
+        await db.commit()
+    async with SessionLocal(bind=created) as db:
+        db.add(User(username="on-replica", email="replica@example.com", password_hash="x"))
+        await db.commit()
+    yield created
+    await created.dispose()
+
+async def usernames(db) -> list:
+    return sorted(await db.scalars(select(User.username)))
+
+async def test_reads_go_to_the_replica(replica):
+    async with ReadSessionLocal() as db:
+        assert await usernames(db) == ["on-replica"]
+
+async def test_writes_and_later_reads_go_to_the_primary(replica):
+    async with ReadSessionLocal() as db:
+        db.add(User(username="new", email="new@example.com", password_hash="x"))
+        await db.flush()
+        assert await usernames(db) == ["new", "on-primary"]
+        await db.rollback()
+
+async def test_locking_reads_go_to_the_primary(replica):
+    async with ReadSessionLocal() as db:
+        result = await db.scalars(select(User.username).with_for_update())
+        assert list(result) == ["on-primary"]
+
+async def test_use_primary_pins_the_session(replica):
+    async with ReadSessionLocal() as db:
+        use_primary(db)
+        assert await usernames(db) == ["on-primary"]
+    
+    async with SessionLocal() as db:
+        assert await usernames(db) == ["on-primary"]
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import select
+from chatbot import chatbot
+from models import Message
+from response_catalog import response_catalog
+
+pytestmark = pytest.mark.anyio
+
+async def search(client, headers, q: str) -> list:
+    response = await client.get("/chat/search", params={"q": q}, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+async def test_search_finds_catalog_responses(client, db, user_headers, monkeypatch):
+    monkeypatch.setitem(chatbot.responses, "goodbye", ["Farewell from the quokka"])
+    await response_catalog.sync(db, chatbot.responses)
+    await client.post("/chat/send", json={"message": "bye"}, headers=user_headers)
+    
+    stored = await db.scalar(select(Message))
+    assert stored.response_ref_id is not None
+    [result] = await search(client, user_headers, "quokka")
+    assert result["response_text"] == "Farewell from the quokka"
+
+async def test_search_finds_words_in_long_messages(client, user_headers):
+    message = " ".join(["filler"] * 200 + ["zebraword"] + ["filler"] * 100)
+    assert len(message) >= 1720
+    await client.post("/chat/send", json={"message": message}, headers=user_headers)
+    
+    [result] = await search(client, user_headers, "zebraword")
+    assert result["message_text"] == message
+
+async def test_search_on_an_unsupported_database_is_501(client, db_engine, user_headers, admin_headers, monkeypatch):
+    monkeypatch.setattr(db_engine.sync_engine.dialect, "name", "postgresql")
+    response = await client.get("/chat/search", params={"q": "hello"}, headers=user_headers)
+    assert response.status_code == 501
+    response = await client.get("/admin/messages/search", params={"q": "hello"}, headers=admin_headers)
+    assert response.status_code == 501
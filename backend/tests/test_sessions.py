@@ -0,0 +1,70 @@
+import pytest
+from datetime import datetime
+from crud import create_messages_bulk
+from query_stats import assert_max_queries, capture_queries
+
+pytestmark = pytest.mark.anyio
+
+async def seed_sessions(client, headers, sessions: int, turns: int = 2):
+    """Create chat sessions with a few turns each, returning their ids."""
+    ids = []
+    for index in range(sessions):
+        session_id = None
+        for turn in range(turns):
+            payload = {"message": f"session {index} turn {turn}"}
+            if session_id:
+                payload["session_id"] = session_id
+            response = await client.post("/chat/send", json=payload, headers=headers)
+            session_id = response.json()["session_id"]
+        ids.append(session_id)
+    return ids
+
+async def sessions_query_count(client, headers, **params) -> int:
+    with capture_queries() as stats:
+        response = await client.get("/chat/sessions", params=params, headers=headers)
+    assert response.status_code == 200
+    return stats.count
+
+@pytest.mark.parametrize("summary", [False, True])
+async def test_session_listing_query_count_is_constant(client, user_headers, summary):
+    # Warm the principal cache so only the listing's own queries are counted
+    await client.get("/auth/me", headers=user_headers)
+    await seed_sessions(client, user_headers, 1)
+    single = await sessions_query_count(client, user_headers, summary=summary)
+    
+    await seed_sessions(client, user_headers, 9)
+    with assert_max_queries(single):
+        response = await client.get("/chat/sessions", params={"summary": summary}, headers=user_headers)
+    assert len(response.json()) == 10
+    # Sessions plus messages, or sessions plus counts and last messages
+    assert single <= 3
+
+async def test_session_listing_returns_messages_and_summaries(client, user_headers):
+    ids = await seed_sessions(client, user_headers, 2, turns=3)
+    
+    response = await client.get("/chat/sessions", headers=user_headers)
+    by_id = {session["id"]: session for session in response.json()}
+    assert [message["message_text"] for message in by_id[ids[0]]["messages"]] == [
+        "session 0 turn 0", "session 0 turn 1", "session 0 turn 2"
+    ]
+    
+    response = await client.get("/chat/sessions", params={"summary": True}, headers=user_headers)
+    by_id = {session["id"]: session for session in response.json()}
+    assert by_id[ids[1]]["message_count"] == 3
+    assert by_id[ids[1]]["last_message_preview"] == "session 1 turn 2"
+
+async def test_summary_picks_the_newest_message_not_the_highest_id(client, db, user_headers):
+    [session_id] = await seed_sessions(client, user_headers, 1, turns=1)
+    # A worker with an older id block can write the newest message
+    rows = [
+        {"id": 900, "user_id": 1, "session_id": session_id, "message_text": "older, higher id",
+         "created_at": datetime(2030, 1, 1, 12, 0, 0)},
+        {"id": 500, "user_id": 1, "session_id": session_id, "message_text": "newest, lower id",
+         "created_at": datetime(2030, 1, 1, 12, 0, 1)}
+    ]
+    await create_messages_bulk(db, rows)
+    
+    response = await client.get("/chat/sessions", params={"summary": True}, headers=user_headers)
+    [summary] = response.json()
+    assert summary["message_count"] == 3
+    assert summary["last_message_preview"] == "newest, lower id"
@@ -16,7 +16,8 @@ CREATE TABLE IF NOT EXISTS users (
     is_admin BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_email (email)
+    INDEX idx_email (email),
+    INDEX idx_users_created_id (created_at, id)
 );
 
 CREATE TABLE IF NOT EXISTS sessions (
@@ -27,7 +28,8 @@ CREATE TABLE IF NOT EXISTS sessions (
     ended_at TIMESTAMP NULL,
     is_active BOOLEAN DEFAULT TRUE,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
-    INDEX idx_user_id (user_id)
+    INDEX idx_user_id (user_id),
+    INDEX idx_sessions_user_started (user_id, started_at)
 );
 
 CREATE TABLE IF NOT EXISTS messages (
@@ -41,7 +43,10 @@ CREATE TABLE IF NOT EXISTS messages (
     FOREIGN KEY (session_id) REFERENCES sessions(id) ON DELETE SET NULL,
     INDEX idx_user_id (user_id),
     INDEX idx_session_id (session_id),
-    INDEX idx_created_at (created_at)
+    INDEX idx_created_at (created_at),
+    INDEX idx_messages_user_created_id (user_id, created_at, id),
+    INDEX idx_messages_created_id (created_at, id),
+    INDEX idx_messages_session_user_created (session_id, user_id, created_at, id)
 );
 
 -- Insert sample admin user (password: admin123)